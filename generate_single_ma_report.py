@@ -1,10 +1,23 @@
 from html import escape as html_escape
 import pandas as pd
+from pandas.api.types import union_categoricals
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import io
 import os
+import re
+import shutil
+import gzip
 from datetime import datetime
 import json
+import math
+from functools import lru_cache
+from itertools import compress, repeat
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import paths
 import inventory_db
 import checked_items_db
@@ -67,6 +80,51 @@ def get_corrected_ma(timeseries, n_months):
     return latest_ma, usage_months, is_corrected
 
 
+def get_corrected_ma_array(ts_matrix, n_months):
+    """
+    get_corrected_ma()를 전체 약품에 대해 한 번에 계산 (NumPy 벡터화)
+
+    Args:
+        ts_matrix: stack_timeseries()로 만든 (약품 수, 개월 수) 2차원 배열
+        n_months: 이동평균 개월 수
+
+    Returns:
+        tuple: (latest_ma, usage_months, is_corrected) 약품별 배열
+        - latest_ma: 보정된 최신 이동평균 (사용 이력이 없으면 NaN)
+        - usage_months: 첫 사용 시점부터 현재까지의 개월 수 (사용 이력 없으면 0)
+        - is_corrected: 보정이 적용되었는지 여부
+    """
+    n_drugs, n_total = ts_matrix.shape
+    if n_drugs == 0 or n_total == 0:
+        return np.full(n_drugs, np.nan), np.zeros(n_drugs, dtype=int), np.zeros(n_drugs, dtype=bool)
+
+    # 길이가 다른 시계열이 섞여 있으면 행별로 계산
+    ragged_rows = unstack_timeseries(ts_matrix)
+    if ragged_rows is not None:
+        results = [get_corrected_ma(row, n_months) for row in ragged_rows]
+        latest_ma = np.array([np.nan if ma is None else ma for ma, _, _ in results], dtype=float)
+        usage_months = np.array([usage for _, usage, _ in results], dtype=int)
+        is_corrected = np.array([corrected for _, _, corrected in results], dtype=bool)
+        return latest_ma, usage_months, is_corrected
+
+    used = ts_matrix > 0
+    has_usage = used.any(axis=1)
+    first_usage_idx = np.argmax(used, axis=1)
+    usage_months = np.where(has_usage, n_total - first_usage_idx, 0)
+
+    # 신규 약품: 사용 기간 < n_months → 첫 사용 시점부터 끝까지의 평균
+    is_corrected = has_usage & (usage_months < n_months)
+    since_first_use = np.arange(n_total) >= first_usage_idx[:, None]
+    corrected_ma = np.where(since_first_use, ts_matrix, 0).sum(axis=1) / np.maximum(usage_months, 1)
+
+    # 기존 방식: 최근 n_months의 평균
+    recent_ma = ts_matrix[:, -n_months:].sum(axis=1) / n_months
+
+    latest_ma = np.where(is_corrected, corrected_ma, recent_ma)
+    latest_ma[~has_usage] = np.nan
+    return latest_ma, usage_months, is_corrected
+
+
 def calculate_custom_ma(timeseries, n_months):
     """
     N개월 이동평균 계산
@@ -78,124 +136,474 @@ def calculate_custom_ma(timeseries, n_months):
     Returns:
         이동평균 리스트 (앞부분은 None)
     """
-    ma_list = []
-    for i in range(len(timeseries)):
-        if i < n_months - 1:
-            ma_list.append(None)
-        else:
-            window = timeseries[i - n_months + 1 : i + 1]
-            ma_list.append(sum(window) / n_months)
-    return ma_list
+    values = np.asarray(timeseries, dtype=np.float64)
+    # 창보다 짧은 시계열은 이동평균을 낼 수 없음 (np.convolve는 길이가 짧은 쪽과 자리를 바꾸므로 먼저 처리)
+    if len(values) < n_months:
+        return [None] * len(values)
+
+    # 창마다 합을 따로 구하는 convolve를 사용 (누적합 차이 방식과 달리 오차가 쌓이지 않음)
+    window_sums = np.convolve(values, np.ones(n_months), mode='valid')
+    return [None] * (n_months - 1) + (window_sums / n_months).tolist()
+
+def stack_timeseries(timeseries_series):
+    """
+    월별_조제수량_리스트 컬럼을 (약품 수, 개월 수) 2차원 배열로 변환
+
+    모든 약품의 시계열은 보통 같은 월 목록을 기준으로 만들어져 길이가 같지만,
+    갱신되지 않은 행 등으로 길이가 다르면 짧은 행의 뒷부분을 NaN으로 채워 가장 긴 길이에 맞춘다.
+    (NaN으로 채운 행이 있으면 일괄 계산 함수들은 행별 계산으로 대신 처리, unstack_timeseries 참고)
+
+    Returns:
+        np.ndarray: float64 2차원 배열 (약품이 없으면 shape (0, 0))
+    """
+    if len(timeseries_series) == 0:
+        return np.empty((0, 0))
+    rows = timeseries_series.tolist()
+    lengths = [len(row) for row in rows]
+    width = max(lengths)
+    if min(lengths) == width:
+        return np.array(rows, dtype=float)
+
+    ts_matrix = np.full((len(rows), width), np.nan)
+    for i, (row, length) in enumerate(zip(rows, lengths)):
+        ts_matrix[i, :length] = row
+    return ts_matrix
+
+
+def unstack_timeseries(ts_matrix):
+    """
+    stack_timeseries가 NaN으로 채운 행이 있으면 행별 원래 길이의 시계열 리스트로 되돌림
+
+    Returns:
+        list | None: 약품별 시계열 리스트 (길이가 모두 같아 채운 행이 없으면 None)
+    """
+    valid = ~np.isnan(ts_matrix)
+    if valid.all():
+        return None
+    return [row[:length] for row, length in zip(ts_matrix.tolist(), valid.sum(axis=1).tolist())]
+
+
+def calculate_custom_ma_rows(ts_matrix, n_months):
+    """
+    모든 약품의 N개월 이동평균을 한 번에 계산 (calculate_custom_ma의 일괄 버전)
+
+    Args:
+        ts_matrix: stack_timeseries()로 만든 (약품 수, 개월 수) 2차원 배열
+        n_months: 이동평균 개월 수
+
+    Returns:
+        list: 약품별 이동평균 리스트 (앞부분은 None, calculate_custom_ma와 같은 형식)
+    """
+    ragged_rows = unstack_timeseries(ts_matrix)
+    if ragged_rows is not None:
+        return [calculate_custom_ma(row, n_months) for row in ragged_rows]
+
+    n_drugs, n_cols = ts_matrix.shape
+    if n_cols < n_months:
+        return [[None] * n_cols for _ in range(n_drugs)]
+
+    windows = np.lib.stride_tricks.sliding_window_view(ts_matrix, n_months, axis=1)
+    ma_matrix = windows.sum(axis=-1) / n_months
+    padding = [None] * (n_months - 1)
+    return [padding + ma for ma in ma_matrix.tolist()]
+
+
+def get_corrected_ma_columns(df, n_months):
+    """
+    약품별 보정 N개월 이동평균 배열 (latest_ma, usage_months, is_corrected)
+
+    generate_html_report가 미리 계산해 둔 컬럼(_보정_이동평균/_사용기간/_신규여부)이 있으면
+    재사용하고 (특수 케이스 분류와 런웨이 분석이 같은 값을 다시 계산하지 않도록), 없으면 새로 계산
+    """
+    if '_보정_이동평균' in df.columns:
+        return df['_보정_이동평균'].to_numpy(), df['_사용기간'].to_numpy(), df['_신규여부'].to_numpy()
+    return get_corrected_ma_array(stack_timeseries(df['월별_조제수량_리스트']), n_months)
+
+
+def get_last_use_indices(ts_matrix):
+    """
+    각 약품의 마지막 사용(0이 아닌 값) 인덱스를 한 번에 계산
+
+    Args:
+        ts_matrix: stack_timeseries()로 만든 2차원 배열
+
+    Returns:
+        np.ndarray: 약품별 마지막 사용 인덱스 (사용 기록이 없으면 -1)
+    """
+    used = ts_matrix > 0
+    if used.shape[1] == 0:
+        return np.full(used.shape[0], -1, dtype=int)
+    has_any = used.any(axis=1)
+    last_idx = used.shape[1] - 1 - np.argmax(used[:, ::-1], axis=1)
+    return np.where(has_any, last_idx, -1)
+
+
+# 겨울철로 표시할 월 (10월 ~ 2월)
+WINTER_MONTHS = {10, 11, 12, 1, 2}
+
+# 'YYYY-MM' 형식의 월 레이블 (메타데이터가 없을 때의 'Month N' 레이블 등은 매칭되지 않음)
+_YEAR_MONTH_RE = re.compile(r'\d{4}-(\d{2})')
+
+
+def get_winter_shapes(months):
+    """
+    인라인 차트의 겨울철 배경 영역(Plotly shape) 목록 생성
+
+    모든 약품이 같은 월 목록을 쓰므로 리포트 생성 시 한 번만 계산한다.
+
+    Args:
+        months: 'YYYY-MM' 형식의 월 목록 (그 외 형식의 레이블은 겨울철이 아닌 것으로 취급)
+
+    Returns:
+        list: Plotly layout.shapes에 넣을 사각형 dict 목록
+    """
+    shapes = []
+    winter_start = None
+    for i, month in enumerate(months):
+        match = _YEAR_MONTH_RE.fullmatch(str(month))
+        is_winter = match is not None and int(match.group(1)) in WINTER_MONTHS
+        if is_winter and winter_start is None:
+            winter_start = i
+        elif not is_winter and winter_start is not None:
+            shapes.append((winter_start, i - 1))
+            winter_start = None
+    if winter_start is not None:
+        shapes.append((winter_start, len(months) - 1))
+
+    return [
+        {
+            'type': 'rect', 'xref': 'x', 'yref': 'paper',
+            'x0': months[start], 'x1': months[end],
+            'y0': 0, 'y1': 1,
+            'fillcolor': 'rgba(135, 206, 250, 0.2)', 'line': {'width': 0}, 'layer': 'below'
+        }
+        for start, end in shapes
+    ]
+
 
-def create_sparkline_svg(timeseries_data, ma_data, ma_months):
+SPARKLINE_WIDTH = 120
+SPARKLINE_HEIGHT = 40
+SPARKLINE_PADDING = 2
+
+
+@lru_cache(maxsize=None)
+def _sparkline_x_labels(total):
+    """
+    길이 total인 시계열의 스파크라인 X 좌표 문자열 ("x.xx,") 튜플
+
+    X 좌표는 시계열 길이에만 의존하므로 길이별로 한 번만 계산/포맷한다.
+    120x40 크기에서는 소수점 첫째 자리로 충분하므로 좌표는 .1f로 출력한다.
+    """
+    width, padding = SPARKLINE_WIDTH, SPARKLINE_PADDING
+    if total > 1:
+        xs = padding + (np.arange(total) / (total - 1)) * (width - 2 * padding)
+    else:
+        xs = np.full(total, width / 2)
+    return tuple(f"{x:.1f}," for x in xs.tolist())
+
+
+def create_sparkline_svg(timeseries_data, ma_data, ma_months, registry=None):
     """
     경량 SVG 스파크라인 생성 (검정 점선 + 파란색 N-MA)
+
+    간헐 사용/일정 사용 약품은 같은 시계열이 자주 반복되므로
+    (시계열, 이동평균) 튜플 기준으로 결과를 캐시해 재사용.
+    registry(보고서 단위 dict)를 넘기면 같은 모양은 문서에 한 번만 싣는다 (share_sparkline_svg 참고)
     """
-    if not timeseries_data or all(v == 0 for v in timeseries_data):
-        return '<svg width="120" height="40"></svg>'
+    svg = _create_sparkline_svg(
+        tuple(timeseries_data) if timeseries_data is not None else (),
+        tuple(ma_data) if ma_data else (),
+        ma_months,
+    )
+    if registry is None:
+        return svg
+    return share_sparkline_svg(svg, registry)
+
+
+def share_sparkline_svg(svg, registry):
+    """
+    같은 보고서 안에서 모양이 같은 스파크라인은 처음 한 번만 선을 그리고 이후에는 <use>로 참조
 
-    width = 120
-    height = 40
-    padding = 2
+    처음 나온 스파크라인의 선들을 <g id="spark-N">로 묶어 두고, 같은 SVG가 다시 나오면
+    점 좌표 없이 <use href="#spark-N"/>만 출력한다. 행은 문서에서 제거되지 않으므로
+    (숨김은 display:none) 참조 대상은 항상 남아 있다.
 
-    # 데이터 정규화
-    all_values = [v for v in timeseries_data if v > 0]
-    if not all_values:
+    Args:
+        svg: create_sparkline_svg가 만든 SVG 문자열
+        registry: SVG 문자열 → 심볼 id (보고서마다 새 dict)
+    """
+    ref = registry.get(svg)
+    if ref is not None:
+        return f'<svg width="{SPARKLINE_WIDTH}" height="{SPARKLINE_HEIGHT}"><use href="#{ref}"/></svg>'
+
+    head, _, body = svg.partition('>')
+    if not body.startswith('<polyline'):
+        # 빈 스파크라인은 참조로 바꿔도 줄어들지 않음
+        return svg
+
+    ref = f"spark-{len(registry)}"
+    registry[svg] = ref
+    return f'{head}><g id="{ref}">{body[:-len("</svg>")]}</g></svg>'
+
+
+@lru_cache(maxsize=8192)
+def _create_sparkline_svg(timeseries_data, ma_data, ma_months):
+    """create_sparkline_svg의 캐시되는 본체 (인자는 튜플)"""
+    height = SPARKLINE_HEIGHT
+    padding = SPARKLINE_PADDING
+
+    # 데이터 정규화 (양수 값 기준, 모두 0 이하이면 빈 스파크라인)
+    values = np.asarray(timeseries_data, dtype=float)
+    positive = values[values > 0]
+    if positive.size == 0:
         return '<svg width="120" height="40"></svg>'
 
-    max_val = max(all_values)
-    min_val = min(all_values)
+    max_val = positive.max()
+    min_val = positive.min()
     value_range = max_val - min_val if max_val != min_val else 1
 
-    def scale_y(value):
-        """값을 SVG 좌표로 변환 (위아래 반전)"""
-        normalized = (value - min_val) / value_range
+    def scale_y(arr):
+        """값 배열을 SVG 좌표로 변환 (위아래 반전)"""
+        normalized = (arr - min_val) / value_range
         return height - padding - (normalized * (height - 2 * padding))
 
-    def scale_x(index, total):
-        """인덱스를 X 좌표로 변환"""
-        return padding + (index / (total - 1)) * (width - 2 * padding) if total > 1 else width / 2
+    ma_ys, has_ma = [], []
+    if ma_data:
+        ma_values = np.array(ma_data, dtype=float)
+        ma_ys = scale_y(ma_values).tolist()
+        has_ma = (~np.isnan(ma_values)).tolist()
 
-    # 실제 값 라인 (회색 점선)
-    points = []
-    for i, val in enumerate(timeseries_data):
-        x = scale_x(i, len(timeseries_data))
-        y = scale_y(val)
-        points.append(f"{x:.2f},{y:.2f}")
+    return _sparkline_svg_markup(scale_y(values).tolist(), ma_ys, has_ma)
 
-    actual_line = f'<polyline points="{" ".join(points)}" fill="none" stroke="#a1a1aa" stroke-width="1" stroke-dasharray="2,2" />'
 
-    # N개월 이동평균 라인 (브랜드 색상 실선)
+def _sparkline_svg_markup(ys, ma_ys, has_ma):
+    """
+    SVG 좌표로 변환된 Y값으로 스파크라인 SVG 문자열 조립 (단건/일괄 생성 공용)
+
+    Args:
+        ys: 실제 값의 Y 좌표 리스트
+        ma_ys: 이동평균의 Y 좌표 리스트 (None 구간은 NaN)
+        has_ma: 이동평균 값이 있는 위치 (bool 리스트)
+    """
+    # 실제 값 라인 (회색 점선)
+    x_labels = _sparkline_x_labels(len(ys))
+    points = " ".join([x + f"{y:.1f}" for x, y in zip(x_labels, ys)])
+    actual_line = f'<polyline points="{points}" fill="none" stroke="#a1a1aa" stroke-width="1" stroke-dasharray="2,2" />'
+
+    # N개월 이동평균 라인 (브랜드 색상 실선, None 구간은 제외)
     ma_line = ''
-    if ma_data and any(v is not None for v in ma_data):
-        ma_points = []
-        for i, val in enumerate(ma_data):
-            if val is not None:
-                x = scale_x(i, len(ma_data))
-                y = scale_y(val)
-                ma_points.append(f"{x:.2f},{y:.2f}")
+    if any(has_ma):
+        ma_points = " ".join([x + f"{y:.1f}" for x, y in compress(zip(_sparkline_x_labels(len(ma_ys)), ma_ys), has_ma)])
+        ma_line = f'<polyline points="{ma_points}" fill="none" stroke="#475569" stroke-width="2" />'
+
+    # display:block은 행마다 싣지 않고 보고서 CSS의 td > svg 규칙으로 지정
+    return f'<svg width="{SPARKLINE_WIDTH}" height="{SPARKLINE_HEIGHT}">{actual_line}{ma_line}</svg>'
+
+
+def create_sparkline_svgs(ts_matrix, ma_lists, ma_months, registry=None):
+    """
+    여러 약품의 스파크라인을 한 번에 생성 (create_sparkline_svg의 일괄 버전)
+
+    약품별 최소/최대값과 SVG 좌표 변환을 2차원 배열 연산으로 한 번에 처리하고,
+    행마다 남는 일은 좌표 문자열 포맷뿐이다. 같은 시계열이 반복되면 고유한 행만 포맷한다.
+
+    Args:
+        ts_matrix: stack_timeseries()로 만든 (약품 수, 개월 수) 2차원 배열
+        ma_lists: 약품별 이동평균 리스트 (calculate_custom_ma_rows 형식, 앞부분 None)
+        ma_months: 이동평균 개월 수
+        registry: share_sparkline_svg용 보고서 단위 dict (없으면 공유하지 않음)
+
+    Returns:
+        list: 약품별 SVG 문자열 (create_sparkline_svg와 같은 출력)
+    """
+    height = SPARKLINE_HEIGHT
+    padding = SPARKLINE_PADDING
+    n_drugs = ts_matrix.shape[0]
+    if n_drugs == 0:
+        return []
+
+    # 길이가 다른 시계열이 섞여 있으면 행별로 생성 (결과는 일괄 생성과 같음)
+    ragged_rows = unstack_timeseries(ts_matrix)
+    if ragged_rows is not None:
+        return [
+            create_sparkline_svg(row, ma, ma_months, registry)
+            for row, ma in zip(ragged_rows, ma_lists)
+        ]
+    ma_matrix = np.array(ma_lists, dtype=float).reshape(n_drugs, -1)
+
+    # 같은 (시계열, 이동평균) 조합은 한 번만 그림 (모두 0, 단발성 사용 등 반복 패턴이 많음)
+    # NaN끼리는 같은 값으로 비교되지 않으므로 키에서는 0으로 바꾸고 유효 위치 마스크를 함께 넣음
+    has_ma_matrix = ~np.isnan(ma_matrix)
+    row_keys = np.hstack([ts_matrix, np.where(has_ma_matrix, ma_matrix, 0), has_ma_matrix])
+    _, first_rows, inverse = np.unique(row_keys, axis=0, return_index=True, return_inverse=True)
+    ts_matrix = ts_matrix[first_rows]
+    ma_matrix = ma_matrix[first_rows]
+
+    # 양수 값 기준 약품별 최소/최대 (양수가 없는 약품은 빈 스파크라인)
+    positive = ts_matrix > 0
+    has_positive = positive.any(axis=1)
+    max_val = np.where(positive, ts_matrix, -np.inf).max(axis=1, initial=-np.inf)[:, None]
+    min_val = np.where(positive, ts_matrix, np.inf).min(axis=1, initial=np.inf)[:, None]
+    value_range = np.where(max_val != min_val, max_val - min_val, 1)
+
+    with np.errstate(invalid='ignore'):
+        ys = height - padding - ((ts_matrix - min_val) / value_range * (height - 2 * padding))
+        ma_ys = height - padding - ((ma_matrix - min_val) / value_range * (height - 2 * padding))
+
+    unique_svgs = [
+        _sparkline_svg_markup(y_row, ma_row, mask) if ok else '<svg width="120" height="40"></svg>'
+        for ok, y_row, ma_row, mask in zip(
+            has_positive.tolist(), ys.tolist(), ma_ys.tolist(), has_ma_matrix[first_rows].tolist()
+        )
+    ]
+    svgs = [unique_svgs[i] for i in inverse.ravel().tolist()]
+    if registry is None:
+        return svgs
+    return [share_sparkline_svg(svg, registry) for svg in svgs]
+
+def to_native(val):
+    """numpy/pandas 스칼라를 JSON 직렬화 가능한 Python native 타입으로 변환"""
+    if hasattr(val, 'item'):  # numpy/pandas scalar
+        return val.item()
+    return val
+
+
+def to_native_list(values):
+    """
+    숫자 리스트를 Python native 타입 리스트로 변환
+
+    숫자만 있으면 numpy 배열로 한 번에 tolist() (원소별 to_native 호출 생략),
+    None 등이 섞인 경우에만 원소별로 변환
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'biuf':
+        return arr.tolist()
+    return [to_native(v) for v in values]
+
+
+# 표준 json 대체 경로용 인코더 (json.dumps는 기본값이 아닌 옵션을 주면 호출마다 인코더를 새로 만듦)
+# NaN/Infinity는 유효한 JSON이 아니므로 내보내지 않음 (dumps_json에서 null로 바꿔 다시 인코딩)
+_json_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode
+
+
+def _replace_non_finite(obj):
+    """dict/list 안의 NaN/Infinity float를 None으로 바꾼 사본 (orjson과 같은 null 출력용)"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _replace_non_finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(value) for value in obj]
+    return obj
+
+
+def dumps_json(obj):
+    """
+    보고서에 싣는 JSON 직렬화
+
+    orjson이 설치되어 있으면 사용하고, 없으면 표준 json으로 같은 형식(공백 없는 구분자)으로 출력.
+    NaN/Infinity는 두 경로 모두 null로 출력한다 (표준 json은 값이 있을 때만 변환 후 다시 인코딩).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    try:
+        return _json_encode(obj)
+    except ValueError:
+        return _json_encode(_replace_non_finite(obj))
+
+
+def create_chart_series_entry(timeseries_data, ma_data):
+    """
+    CHART_SERIES 페이로드용 약품별 [조제수량, 이동평균] 쌍 생성
 
-        if ma_points:
-            ma_line = f'<polyline points="{" ".join(ma_points)}" fill="none" stroke="#475569" stroke-width="2" />'
+    월 목록과 시계열은 행마다 반복하지 않고 리포트에 한 번만 싣는다.
+    이동평균은 소수점 둘째 자리로 반올림 (툴팁 표시 정밀도와 동일).
+    """
+    return [
+        to_native_list(timeseries_data),
+        [round(float(v), 2) if v is not None else None for v in ma_data],
+    ]
 
-    svg = f'<svg width="{width}" height="{height}" style="display:block;">{actual_line}{ma_line}</svg>'
-    return svg
 
 def create_chart_data_json(months, timeseries_data, ma_data, avg, drug_name, drug_code, ma_months, stock=0, runway='N/A'):
     """
     인라인 차트용 데이터를 JSON으로 변환
     """
-    # numpy/pandas 타입을 Python native 타입으로 변환
-    def convert_to_native(val):
-        if hasattr(val, 'item'):  # numpy/pandas scalar
-            return val.item()
-        return val
-
-    return json.dumps({
+    return dumps_json({
         'months': months,
-        'timeseries': [convert_to_native(v) for v in timeseries_data],
-        'ma': [convert_to_native(v) if v is not None else None for v in ma_data],
-        'avg': convert_to_native(avg),
+        'timeseries': to_native_list(timeseries_data),
+        'ma': to_native_list(ma_data),
+        'avg': to_native(avg),
         'drug_name': str(drug_name),
         'drug_code': str(drug_code),
         'ma_months': ma_months,
-        'stock': convert_to_native(stock),
-        'latest_ma': convert_to_native(avg),
+        'stock': to_native(stock),
+        'latest_ma': to_native(avg),
         'runway': runway
-    }, ensure_ascii=False)
+    })
+
 
-def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low=3, threshold_high=12):
+def create_row_chart_data_json(avg, drug_name, drug_code, ma_months, stock=0, runway='N/A'):
     """
-    DataFrame을 HTML 보고서로 생성 (Single MA 버전)
-    months: 월 리스트 (예: ['2025-01', '2025-02', ...])
-    mode: 'dispense' (전문약) 또는 'sale' (일반약)
-    ma_months: 이동평균 개월 수
-    threshold_low: 부족/충분 경계 (개월)
-    threshold_high: 충분/과다 경계 (개월)
+    행(data-chart-data)에 싣는 인라인 차트 데이터를 JSON으로 변환
+
+    시계열/이동평균/월 목록은 CHART_SERIES에서 약품코드로 찾아 쓰므로 여기에 포함하지 않음
     """
+    return dumps_json({
+        'avg': to_native(avg),
+        'drug_name': str(drug_name),
+        'drug_code': str(drug_code),
+        'ma_months': ma_months,
+        'stock': to_native(stock),
+        'latest_ma': to_native(avg),
+        'runway': runway
+    })
 
-    # 모드에 따른 제목 설정
-    mode_titles = {
-        'dispense': f'전문약 재고 관리 보고서 ({ma_months}개월 이동평균)',
-        'sale': f'일반약 재고 관리 보고서 ({ma_months}개월 이동평균)'
-    }
-    report_title = mode_titles.get(mode, f'약품 재고 관리 보고서 ({ma_months}개월 이동평균)')
 
-    # 개별 임계값 데이터 로드
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
+# 섹션 행(data-chart-data) 인라인 차트 데이터 템플릿 (키 구성이 고정이라 dict 직렬화 대신 값만 채움)
+_SECTION_CHART_DATA_TEMPLATE = (
+    '{{"drug_name":{drug_name},"drug_code":{drug_code},"ma_months":{ma_months},'
+    '"stock":{stock},"latest_ma":{latest_ma},"runway":{runway}}}'
+)
 
-    # HTML 템플릿 시작
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="ko">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{report_title}</title>
-        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css">
+
+def _json_number(value):
+    """
+    JSON 숫자 리터럴
+
+    일반 범위(지수 표기가 나오지 않는 범위)의 int/float는 repr을 그대로 쓰고,
+    numpy 스칼라/NaN 등 나머지는 dumps_json에 맡겨 기존 출력과 동일하게 유지
+    """
+    if type(value) is int:
+        return str(value)
+    if type(value) is float and (value == 0 or 1e-4 <= abs(value) < 1e16):
+        return float.__repr__(value)
+    return dumps_json(to_native(value))
+
+
+def create_section_chart_data_json(drug_name, drug_code, ma_months, stock, latest_ma, runway):
+    """
+    섹션 행에 싣는 인라인 차트 데이터 JSON (HTML 속성값으로 이스케이프된 문자열)
+
+    문자열 값만 JSON 인코딩하고 나머지는 템플릿에 바로 채움
+    (약품명이 없거나 결측값(NaN)이면 truncate_display_series와 같이 "정보없음"으로 표시)
+    """
+    if not drug_name or pd.isna(drug_name):
+        drug_name = "정보없음"
+    return html_escape(_SECTION_CHART_DATA_TEMPLATE.format(
+        drug_name=_json_encode(str(drug_name)),
+        drug_code=_json_encode(str(drug_code)),
+        ma_months=_json_number(ma_months),
+        stock=_json_number(stock),
+        latest_ma=_json_number(latest_ma),
+        runway=_json_encode(runway),
+    ))
+
+# 보고서 공통 스타일 (정적 CSS라 호출마다 f-string으로 다시 조립하지 않도록 모듈 상수로 분리)
+_REPORT_STYLE = """
         <style>
             /* ===== Design Tokens from design-principles.md ===== */
-            :root {{
+            :root {
                 /* 브랜드 Primary - 차분하고 모던한 슬레이트 블루 */
                 --brand-primary: #475569;
                 --brand-primary-dark: #334155;
@@ -267,10 +675,10 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 --duration-fast: 100ms;
                 --duration-normal: 200ms;
                 --ease-out: cubic-bezier(0, 0, 0.2, 1);
-            }}
+            }
 
             /* ===== Base Styles ===== */
-            body {{
+            body {
                 font-family: 'Pretendard', 'Noto Sans KR', -apple-system, BlinkMacSystemFont, sans-serif;
                 margin: 0;
                 padding: var(--space-6);
@@ -278,9 +686,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 min-height: 100vh;
                 color: var(--text-primary);
                 line-height: 1.5;
-            }}
+            }
 
-            .container {{
+            .container {
                 max-width: 1400px;
                 margin: 0 auto;
                 background: var(--bg-surface);
@@ -288,9 +696,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 box-shadow: var(--shadow-lg);
                 padding: var(--space-8);
                 border: 1px solid var(--border-subtle);
-            }}
+            }
 
-            h1 {{
+            h1 {
                 color: var(--text-primary);
                 text-align: center;
                 margin-bottom: var(--space-3);
@@ -301,9 +709,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 align-items: center;
                 justify-content: center;
                 gap: var(--space-3);
-            }}
+            }
 
-            h2 {{
+            h2 {
                 color: var(--text-primary);
                 font-size: 1.25rem;
                 font-weight: 600;
@@ -311,72 +719,72 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 display: flex;
                 align-items: center;
                 gap: var(--space-2);
-            }}
+            }
 
-            .date {{
+            .date {
                 text-align: left;
                 color: var(--text-muted);
                 margin-bottom: var(--space-2);
                 font-size: 0.875rem;
-            }}
+            }
 
             /* ===== Icon Styles ===== */
-            .icon {{
+            .icon {
                 width: 20px;
                 height: 20px;
                 stroke-width: 2;
                 stroke-linecap: round;
                 stroke-linejoin: round;
                 flex-shrink: 0;
-            }}
-            .icon-sm {{ width: 16px; height: 16px; }}
-            .icon-lg {{ width: 24px; height: 24px; }}
-            .icon-xl {{ width: 32px; height: 32px; }}
+            }
+            .icon-sm { width: 16px; height: 16px; }
+            .icon-lg { width: 24px; height: 24px; }
+            .icon-xl { width: 32px; height: 32px; }
 
             /* ===== Summary Cards (Unused but kept for compatibility) ===== */
-            .summary-grid {{
+            .summary-grid {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
                 gap: var(--space-5);
                 margin: var(--space-6) 0;
-            }}
+            }
 
-            .summary-card {{
+            .summary-card {
                 background: var(--bg-subtle);
                 padding: var(--space-6);
                 border-radius: var(--radius-lg);
                 box-shadow: var(--shadow-xs);
                 border: 1px solid var(--border-subtle);
-            }}
+            }
 
-            .summary-card h3 {{
+            .summary-card h3 {
                 margin: 0 0 var(--space-2) 0;
                 font-size: 0.875rem;
                 color: var(--text-muted);
                 font-weight: 500;
-            }}
+            }
 
-            .summary-card .value {{
+            .summary-card .value {
                 font-size: 1.5rem;
                 font-weight: 700;
                 color: var(--text-primary);
-            }}
+            }
 
             /* ===== Table Styles ===== */
-            .table-container {{
+            .table-container {
                 margin: var(--space-6) 0;
                 overflow-x: auto;
                 border-radius: var(--radius-lg);
                 border: 1px solid var(--border-default);
-            }}
+            }
 
-            table {{
+            table {
                 width: 100%;
                 border-collapse: collapse;
                 font-size: 0.875rem;
-            }}
+            }
 
-            th {{
+            th {
                 background: var(--brand-primary);
                 color: white;
                 padding: var(--space-3) var(--space-4);
@@ -387,53 +795,58 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 font-size: 0.75rem;
                 text-transform: uppercase;
                 letter-spacing: 0.05em;
-            }}
+            }
 
-            th.runway-header {{
+            th.runway-header {
                 background: var(--brand-primary-light);
-            }}
+            }
 
-            td {{
+            td {
                 padding: var(--space-3) var(--space-4);
                 border-bottom: 1px solid var(--border-default);
                 color: var(--text-secondary);
-            }}
+            }
+
+            /* 테이블 셀의 스파크라인 (행마다 인라인 style을 싣지 않도록 여기서 지정) */
+            td > svg {
+                display: block;
+            }
 
-            td.runway-cell {{
+            td.runway-cell {
                 background: var(--bg-subtle);
                 font-weight: 600;
-            }}
+            }
 
-            tr:hover {{
+            tr:hover {
                 background: var(--bg-hover);
-            }}
+            }
 
-            tr:hover td.runway-cell {{
+            tr:hover td.runway-cell {
                 background: var(--border-default);
-            }}
+            }
 
-            .warning {{
+            .warning {
                 background: var(--color-danger-light);
-            }}
+            }
 
-            .warning td {{
+            .warning td {
                 color: var(--color-danger-dark);
-            }}
+            }
 
-            .warning td.runway-cell {{
+            .warning td.runway-cell {
                 background: rgba(254, 226, 226, 0.7);
-            }}
+            }
 
-            .good {{
+            .good {
                 background: var(--color-success-light);
-            }}
+            }
 
-            .good td {{
+            .good td {
                 color: var(--color-success-dark);
-            }}
+            }
 
             /* ===== Search Box ===== */
-            .search-box {{
+            .search-box {
                 margin: var(--space-4) 0;
                 padding: var(--space-3) var(--space-4);
                 width: 100%;
@@ -445,33 +858,33 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 transition: border-color var(--duration-fast) var(--ease-out),
                             box-shadow var(--duration-fast) var(--ease-out);
                 box-sizing: border-box;
-            }}
+            }
 
-            .search-box:hover {{
+            .search-box:hover {
                 border-color: var(--border-strong);
-            }}
+            }
 
-            .search-box:focus {{
+            .search-box:focus {
                 outline: none;
                 border-color: var(--brand-primary);
                 box-shadow: 0 0 0 3px var(--brand-primary-subtle);
-            }}
+            }
 
-            .search-box::placeholder {{
+            .search-box::placeholder {
                 color: var(--text-muted);
-            }}
+            }
 
             /* ===== Chart Container ===== */
-            .chart-container {{
+            .chart-container {
                 margin: var(--space-6) 0;
                 padding: var(--space-5);
                 background: var(--bg-subtle);
                 border-radius: var(--radius-lg);
                 border: 1px solid var(--border-subtle);
-            }}
+            }
 
             /* ===== Buttons ===== */
-            .nav-btn {{
+            .nav-btn {
                 background: var(--brand-primary);
                 color: white;
                 border: none;
@@ -481,26 +894,26 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 font-size: 0.875rem;
                 font-weight: 600;
                 transition: all var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .nav-btn:hover {{
+            .nav-btn:hover {
                 background: var(--brand-primary-dark);
                 transform: translateY(-1px);
                 box-shadow: var(--shadow-sm);
-            }}
+            }
 
-            .nav-btn:active {{
+            .nav-btn:active {
                 transform: translateY(0);
-            }}
+            }
 
-            .nav-btn:disabled {{
+            .nav-btn:disabled {
                 background: var(--text-disabled);
                 cursor: not-allowed;
                 transform: none;
-            }}
+            }
 
             /* ===== Modal Styles ===== */
-            .modal {{
+            .modal {
                 display: none;
                 position: fixed;
                 z-index: 1000;
@@ -511,9 +924,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 overflow: auto;
                 background-color: rgba(0, 0, 0, 0.5);
                 animation: fadeIn var(--duration-normal) var(--ease-out);
-            }}
+            }
 
-            .modal-content {{
+            .modal-content {
                 background-color: var(--bg-surface);
                 margin: 5% auto;
                 padding: var(--space-6);
@@ -522,20 +935,20 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 max-width: 1200px;
                 box-shadow: var(--shadow-xl);
                 animation: scaleIn 300ms cubic-bezier(0.34, 1.56, 0.64, 1);
-            }}
+            }
 
-            @keyframes scaleIn {{
-                from {{
+            @keyframes scaleIn {
+                from {
                     opacity: 0;
                     transform: scale(0.95);
-                }}
-                to {{
+                }
+                to {
                     opacity: 1;
                     transform: scale(1);
-                }}
-            }}
+                }
+            }
 
-            .close-btn {{
+            .close-btn {
                 color: var(--text-muted);
                 float: right;
                 font-size: 1.5rem;
@@ -543,23 +956,23 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 cursor: pointer;
                 line-height: 1;
                 transition: color var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .close-btn:hover {{
+            .close-btn:hover {
                 color: var(--text-primary);
-            }}
+            }
 
             /* ===== Clickable Row Styles ===== */
-            .clickable-row {{
+            .clickable-row {
                 cursor: pointer;
-            }}
+            }
 
-            .clickable-row:hover {{
+            .clickable-row:hover {
                 background: var(--bg-hover) !important;
-            }}
+            }
 
             /* ===== Toggle Section Styles ===== */
-            .toggle-header {{
+            .toggle-header {
                 cursor: pointer;
                 display: flex;
                 justify-content: space-between;
@@ -569,13 +982,13 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 background: var(--bg-subtle);
                 border-radius: var(--radius-lg);
                 transition: background var(--duration-normal) var(--ease-out);
-            }}
+            }
 
-            .toggle-header:hover {{
+            .toggle-header:hover {
                 background: var(--bg-hover);
-            }}
+            }
 
-            .toggle-icon {{
+            .toggle-icon {
                 font-size: 1.25rem;
                 font-weight: bold;
                 transition: transform var(--duration-normal) var(--ease-out);
@@ -585,60 +998,60 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 color: var(--text-muted);
                 width: 24px;
                 height: 24px;
-            }}
+            }
 
-            .toggle-icon.collapsed {{
+            .toggle-icon.collapsed {
                 transform: rotate(-90deg);
-            }}
+            }
 
-            .toggle-content {{
+            .toggle-content {
                 max-height: 10000px;
                 overflow: hidden;
                 transition: max-height var(--duration-normal) var(--ease-out),
                             opacity var(--duration-normal) var(--ease-out);
                 opacity: 1;
-            }}
+            }
 
-            .toggle-content.collapsed {{
+            .toggle-content.collapsed {
                 max-height: 0;
                 opacity: 0;
-            }}
+            }
 
             /* ===== Checked Row ===== */
-            .checked-row {{
+            .checked-row {
                 background: var(--bg-subtle) !important;
                 opacity: 0.6;
-            }}
+            }
 
-            .checked-row td {{
+            .checked-row td {
                 color: var(--text-muted) !important;
-            }}
+            }
 
             /* ===== Inline Chart Row Styles ===== */
-            .tab-clickable-row {{
+            .tab-clickable-row {
                 cursor: pointer;
                 transition: background-color var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .tab-clickable-row:hover {{
+            .tab-clickable-row:hover {
                 background-color: var(--brand-primary-subtle) !important;
-            }}
+            }
 
-            .tab-clickable-row.chart-expanded {{
+            .tab-clickable-row.chart-expanded {
                 background-color: var(--brand-primary-subtle) !important;
                 border-left: 3px solid var(--brand-primary);
-            }}
+            }
 
-            .inline-chart-row {{
+            .inline-chart-row {
                 background: var(--bg-subtle);
-            }}
+            }
 
-            .inline-chart-row:hover {{
+            .inline-chart-row:hover {
                 background: var(--bg-subtle) !important;
-            }}
+            }
 
             /* ===== Memo Button ===== */
-            .memo-btn {{
+            .memo-btn {
                 background: transparent;
                 border: 1px solid var(--border-default);
                 padding: var(--space-1) var(--space-2);
@@ -650,40 +1063,40 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 display: inline-flex;
                 align-items: center;
                 justify-content: center;
-            }}
+            }
 
-            .memo-btn:hover {{
+            .memo-btn:hover {
                 border-color: var(--brand-primary);
                 color: var(--brand-primary);
-            }}
+            }
 
-            .memo-btn.has-memo {{
+            .memo-btn.has-memo {
                 border-color: var(--color-warning);
                 color: var(--color-warning);
                 background: var(--color-warning-light);
-            }}
+            }
 
-            .memo-btn.has-memo:hover {{
+            .memo-btn.has-memo:hover {
                 border-color: var(--color-warning-dark);
                 color: var(--color-warning-dark);
-            }}
+            }
 
             /* ===== Threshold Indicator ===== */
-            .threshold-indicator {{
+            .threshold-indicator {
                 margin-right: var(--space-2);
                 cursor: pointer;
                 opacity: 0.7;
                 display: inline-flex;
                 align-items: center;
                 transition: opacity var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .threshold-indicator:hover {{
+            .threshold-indicator:hover {
                 opacity: 1;
-            }}
+            }
 
             /* ===== New Drug Tag ===== */
-            .new-drug-tag {{
+            .new-drug-tag {
                 display: inline-flex;
                 align-items: center;
                 gap: 3px;
@@ -695,9 +1108,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 margin-left: var(--space-2);
                 font-weight: 500;
                 vertical-align: middle;
-            }}
+            }
 
-            .new-drug-tag .help-icon {{
+            .new-drug-tag .help-icon {
                 display: inline-flex;
                 align-items: center;
                 justify-content: center;
@@ -708,14 +1121,14 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 font-size: 9px;
                 cursor: pointer;
                 transition: background var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .new-drug-tag .help-icon:hover {{
+            .new-drug-tag .help-icon:hover {
                 background: rgba(255,255,255,0.5);
-            }}
+            }
 
             /* ===== Threshold Tooltip ===== */
-            .threshold-tooltip-floating {{
+            .threshold-tooltip-floating {
                 position: fixed;
                 background: var(--brand-primary-dark);
                 color: white;
@@ -728,17 +1141,17 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 box-shadow: var(--shadow-lg);
                 z-index: 9999;
                 pointer-events: none;
-            }}
+            }
 
             /* ===== Checkbox Memo Container ===== */
-            .checkbox-memo-container {{
+            .checkbox-memo-container {
                 display: flex;
                 align-items: center;
                 gap: var(--space-2);
-            }}
+            }
 
             /* ===== Visibility Button ===== */
-            .visibility-btn {{
+            .visibility-btn {
                 background: none;
                 border: 1px solid var(--border-default);
                 border-radius: var(--radius-sm);
@@ -749,27 +1162,27 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 display: inline-flex;
                 align-items: center;
                 justify-content: center;
-            }}
+            }
 
-            .visibility-btn:hover {{
+            .visibility-btn:hover {
                 border-color: var(--brand-primary);
                 background: var(--brand-primary-subtle);
-            }}
+            }
 
-            .visibility-btn.hidden {{
+            .visibility-btn.hidden {
                 color: var(--text-muted);
                 border-color: var(--border-subtle);
                 background: var(--bg-subtle);
-            }}
+            }
 
-            .visibility-btn.hidden:hover {{
+            .visibility-btn.hidden:hover {
                 color: var(--color-success-dark, #276749);
                 border-color: var(--color-success, #48bb78);
                 background: var(--color-success-subtle, #f0fff4);
-            }}
+            }
 
             /* ===== Process Status Badge ===== */
-            .process-status-badge {{
+            .process-status-badge {
                 display: inline-block;
                 padding: 2px 8px;
                 border-radius: var(--radius-sm);
@@ -778,39 +1191,39 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 background: var(--color-warning-subtle, #fffbeb);
                 color: var(--color-warning-dark, #92400e);
                 border: 1px solid var(--color-warning, #f59e0b);
-            }}
-            .process-status-badge.status-처리중 {{
+            }
+            .process-status-badge.status-처리중 {
                 background: var(--color-info-subtle, #eff6ff);
                 color: var(--color-info-dark, #1e40af);
                 border-color: var(--color-info, #3b82f6);
-            }}
-            .process-status-badge.status-완료 {{
+            }
+            .process-status-badge.status-완료 {
                 background: var(--color-success-subtle, #f0fdf4);
                 color: var(--color-success-dark, #166534);
                 border-color: var(--color-success, #22c55e);
-            }}
-            .process-status-badge.status-보류 {{
+            }
+            .process-status-badge.status-보류 {
                 background: var(--bg-surface, #f9fafb);
                 color: var(--text-muted, #6b7280);
                 border-color: var(--border-default, #e5e7eb);
-            }}
+            }
 
             /* ===== Hidden Row ===== */
-            .hidden-row {{
+            .hidden-row {
                 background: var(--bg-subtle) !important;
                 opacity: 0.6;
-            }}
+            }
 
-            .hidden-row td {{
+            .hidden-row td {
                 color: var(--text-muted) !important;
-            }}
+            }
 
-            .hidden-row .visibility-btn {{
+            .hidden-row .visibility-btn {
                 color: var(--text-muted);
-            }}
+            }
 
             /* ===== Bookmark Sidebar ===== */
-            .bookmark-sidebar {{
+            .bookmark-sidebar {
                 position: fixed;
                 right: 0;
                 top: 50%;
@@ -819,9 +1232,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 display: flex;
                 flex-direction: column;
                 gap: var(--space-3);
-            }}
+            }
 
-            .bookmark-item {{
+            .bookmark-item {
                 position: relative;
                 right: -130px;
                 padding: var(--space-3) var(--space-4);
@@ -839,14 +1252,14 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 align-items: center;
                 gap: var(--space-1);
                 user-select: none;
-            }}
+            }
 
-            .bookmark-item:hover {{
+            .bookmark-item:hover {
                 right: 0;
                 box-shadow: var(--shadow-lg);
-            }}
+            }
 
-            .bookmark-item .bookmark-icon {{
+            .bookmark-item .bookmark-icon {
                 display: flex;
                 align-items: center;
                 justify-content: center;
@@ -854,56 +1267,56 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 height: 12px;
                 border-radius: 50%;
                 background: rgba(255, 255, 255, 0.9);
-            }}
+            }
 
-            .bookmark-item .bookmark-title {{
+            .bookmark-item .bookmark-title {
                 font-size: 0.875rem;
                 font-weight: 500;
-            }}
+            }
 
-            .bookmark-item .bookmark-count {{
+            .bookmark-item .bookmark-count {
                 font-size: 1.5rem;
                 font-weight: 700;
                 text-align: center;
-            }}
+            }
 
-            .bookmark-urgent {{
+            .bookmark-urgent {
                 background: var(--color-danger);
-            }}
-            .bookmark-urgent .bookmark-icon {{
+            }
+            .bookmark-urgent .bookmark-icon {
                 background: var(--color-danger-dark);
-            }}
+            }
 
-            .bookmark-low {{
+            .bookmark-low {
                 background: var(--color-warning);
-            }}
-            .bookmark-low .bookmark-icon {{
+            }
+            .bookmark-low .bookmark-icon {
                 background: var(--color-warning-dark);
-            }}
+            }
 
-            .bookmark-high {{
+            .bookmark-high {
                 background: var(--color-success);
-            }}
-            .bookmark-high .bookmark-icon {{
+            }
+            .bookmark-high .bookmark-icon {
                 background: var(--color-success-dark);
-            }}
+            }
 
-            .bookmark-excess {{
+            .bookmark-excess {
                 background: var(--color-info);
-            }}
-            .bookmark-excess .bookmark-icon {{
+            }
+            .bookmark-excess .bookmark-icon {
                 background: var(--color-info-dark);
-            }}
+            }
 
-            .bookmark-dead {{
+            .bookmark-dead {
                 background: var(--text-muted);
-            }}
-            .bookmark-dead .bookmark-icon {{
+            }
+            .bookmark-dead .bookmark-icon {
                 background: var(--text-secondary);
-            }}
+            }
 
             /* ===== Category Modal ===== */
-            .category-modal {{
+            .category-modal {
                 display: none;
                 position: fixed;
                 z-index: 1000;
@@ -914,14 +1327,14 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 overflow: auto;
                 background-color: rgba(0, 0, 0, 0.5);
                 animation: fadeIn var(--duration-normal) var(--ease-out);
-            }}
+            }
 
-            @keyframes fadeIn {{
-                from {{ opacity: 0; }}
-                to {{ opacity: 1; }}
-            }}
+            @keyframes fadeIn {
+                from { opacity: 0; }
+                to { opacity: 1; }
+            }
 
-            .category-modal-content {{
+            .category-modal-content {
                 background-color: var(--bg-surface);
                 margin: 3% auto;
                 padding: var(--space-8);
@@ -932,34 +1345,34 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 overflow-y: auto;
                 box-shadow: var(--shadow-xl);
                 animation: slideUp 300ms cubic-bezier(0.34, 1.56, 0.64, 1);
-            }}
+            }
 
-            @keyframes slideUp {{
-                from {{
+            @keyframes slideUp {
+                from {
                     transform: translateY(20px);
                     opacity: 0;
-                }}
-                to {{
+                }
+                to {
                     transform: translateY(0);
                     opacity: 1;
-                }}
-            }}
+                }
+            }
 
-            .category-modal-header {{
+            .category-modal-header {
                 display: flex;
                 justify-content: space-between;
                 align-items: center;
                 margin-bottom: var(--space-6);
                 padding-bottom: var(--space-5);
                 border-bottom: 1px solid var(--border-default);
-            }}
+            }
 
-            .category-modal-header h2 {{
+            .category-modal-header h2 {
                 margin: 0;
                 font-size: 1.25rem;
-            }}
+            }
 
-            .category-modal-close {{
+            .category-modal-close {
                 color: var(--text-muted);
                 font-size: 1.75rem;
                 font-weight: bold;
@@ -972,15 +1385,15 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 align-items: center;
                 justify-content: center;
                 border-radius: var(--radius-md);
-            }}
+            }
 
-            .category-modal-close:hover {{
+            .category-modal-close:hover {
                 color: var(--text-primary);
                 background: var(--bg-hover);
-            }}
+            }
 
             /* ===== Alert Banner ===== */
-            .alert-banner {{
+            .alert-banner {
                 display: flex;
                 align-items: center;
                 justify-content: space-between;
@@ -990,43 +1403,43 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 border: 1px solid;
                 position: relative;
                 z-index: 950;
-            }}
+            }
 
-            .alert-banner-danger {{
+            .alert-banner-danger {
                 background: var(--color-danger-light);
                 border-color: var(--color-danger);
-            }}
+            }
 
-            .alert-banner-warning {{
+            .alert-banner-warning {
                 background: var(--color-warning-light);
                 border-color: var(--color-warning);
-            }}
+            }
 
             /* ===== Status Distribution Bar ===== */
-            .status-distribution {{
+            .status-distribution {
                 margin: var(--space-6) 0;
                 padding: var(--space-6);
                 background: var(--bg-surface);
                 border-radius: var(--radius-lg);
                 border: 1px solid var(--border-default);
-            }}
+            }
 
-            .status-distribution h2 {{
+            .status-distribution h2 {
                 margin: 0 0 var(--space-4) 0;
-            }}
+            }
 
-            .status-distribution-header {{
+            .status-distribution-header {
                 display: flex;
                 align-items: center;
                 justify-content: space-between;
                 margin-bottom: var(--space-4);
-            }}
+            }
 
-            .status-distribution-header h2 {{
+            .status-distribution-header h2 {
                 margin: 0;
-            }}
+            }
 
-            .trash-shortcut-btn {{
+            .trash-shortcut-btn {
                 display: inline-flex;
                 align-items: center;
                 gap: 6px;
@@ -1038,23 +1451,23 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 font-size: 0.8rem;
                 cursor: pointer;
                 transition: all var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .trash-shortcut-btn:hover {{
+            .trash-shortcut-btn:hover {
                 border-color: var(--text-muted);
                 background: var(--bg-subtle);
                 color: var(--text-secondary);
-            }}
+            }
 
-            .distribution-bar {{
+            .distribution-bar {
                 display: flex;
                 height: 40px;
                 border-radius: var(--radius-md);
                 overflow: hidden;
                 box-shadow: var(--shadow-xs);
-            }}
+            }
 
-            .distribution-bar > div {{
+            .distribution-bar > div {
                 display: flex;
                 align-items: center;
                 justify-content: center;
@@ -1063,35 +1476,42 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 font-size: 0.875rem;
                 transition: flex var(--duration-normal) var(--ease-out), opacity var(--duration-fast) var(--ease-out);
                 cursor: pointer;
-            }}
+            }
 
-            .distribution-bar > div:hover {{
+            .distribution-bar > div:hover {
                 opacity: 0.85;
-            }}
+            }
 
-            .distribution-legend {{
+            .distribution-legend {
                 display: flex;
                 flex-wrap: wrap;
                 gap: var(--space-4);
                 margin-top: var(--space-4);
                 font-size: 0.875rem;
                 color: var(--text-secondary);
-            }}
+            }
 
-            .legend-item {{
+            .legend-item {
                 display: flex;
                 align-items: center;
                 gap: var(--space-2);
-            }}
+            }
 
-            .legend-dot {{
+            .legend-dot {
                 width: 12px;
                 height: 12px;
                 border-radius: 2px;
-            }}
+            }
+
+            /* 분포 막대/범례 색상 */
+            .dist-urgent { background: var(--color-danger); }
+            .dist-low { background: var(--color-warning); }
+            .dist-high { background: var(--color-success); }
+            .dist-excess { background: var(--color-info); }
+            .dist-dead { background: var(--text-muted); }
 
             /* ===== Action Button (for banner) ===== */
-            .btn-action {{
+            .btn-action {
                 padding: var(--space-2) var(--space-4);
                 border: none;
                 border-radius: var(--radius-md);
@@ -1099,18 +1519,102 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 font-weight: 600;
                 font-size: 0.875rem;
                 transition: all var(--duration-fast) var(--ease-out);
-            }}
+            }
 
-            .btn-action-danger {{
+            .btn-action-danger {
                 background: var(--color-danger);
                 color: white;
-            }}
+            }
 
-            .btn-action-danger:hover {{
+            .btn-action-danger:hover {
                 background: var(--color-danger-dark);
-            }}
-        </style>
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+            }
+        </style>"""
+
+# 휴지통 버튼 상태별 (클래스, 아이콘, 툴팁) - 숨김 여부로 바로 고르도록 미리 정의
+_TRASH_BUTTON_STATES = {
+    True: ("hidden", '<i class="bi bi-arrow-counterclockwise"></i>', "복원하기"),
+    False: ("", '<i class="bi bi-trash"></i>', "휴지통에 넣기"),
+}
+
+
+# 메인 약품 테이블 행 템플릿 (행마다 f-string을 다시 조립하지 않도록 한 번만 정의)
+_MAIN_ROW_TEMPLATE = """
+                        <tr class="{runway_class} clickable-row tab-clickable-row" data-drug-code="{drug_code}"
+                            data-chart-data='{chart_data_json}'
+                            onclick="toggleInlineChart(this, '{drug_code}')">
+                            <td style="text-align: center;" onclick="event.stopPropagation()">
+                                <div class="checkbox-memo-container">
+                                    <button class="visibility-btn {hidden_class}" data-drug-code="{drug_code}"
+                                            onclick="event.stopPropagation(); toggleVisibility(this, '{drug_code}')"
+                                            title="{hidden_title}">{hidden_icon}</button>
+                                    <button class="memo-btn {memo_btn_class}"
+                                            data-drug-code="{drug_code}"
+                                            onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
+                                            title="{memo_title}">
+                                        ✎
+                                    </button>
+                                </div>
+                            </td>
+                            <td>{threshold_icon}{drug_name_display}</td>
+                            <td>{company_display}</td>
+                            <td>{drug_code}</td>
+                            <td>{stock_display}</td>
+                            <td>{latest_ma_display}{new_drug_tag}</td>
+                            <td class="runway-cell">{runway_display}</td>
+                            <td>{sparkline_html}</td>
+                        </tr>
+        """
+
+
+def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low=3, threshold_high=12, out=None):
+    """
+    DataFrame을 HTML 보고서로 생성 (Single MA 버전)
+    months: 월 리스트 (예: ['2025-01', '2025-02', ...])
+    mode: 'dispense' (전문약) 또는 'sale' (일반약)
+    ma_months: 이동평균 개월 수
+    threshold_low: 부족/충분 경계 (개월)
+    threshold_high: 충분/과다 경계 (개월)
+    out: 쓰기용 파일 객체 (지정하면 HTML을 직접 기록하고 None 반환, 없으면 문자열 반환)
+    """
+
+    # 모드에 따른 제목 설정
+    mode_titles = {
+        'dispense': f'전문약 재고 관리 보고서 ({ma_months}개월 이동평균)',
+        'sale': f'일반약 재고 관리 보고서 ({ma_months}개월 이동평균)'
+    }
+    report_title = mode_titles.get(mode, f'약품 재고 관리 보고서 ({ma_months}개월 이동평균)')
+
+    # 헤더용 날짜 문자열은 보고서당 한 번만 만들어 둠
+    generated_at = datetime.now().strftime('%Y년 %m월 %d일 %H:%M')
+    month_labels = [f"{m[:4]}년 {m[5:]}월" for m in (months[0], months[-1])]
+    period_str = f"{month_labels[0]} ~ {month_labels[-1]} (총 {len(months)}개월)"
+
+    # 개별 임계값 데이터 로드
+    custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 파일 객체가 주어지면 조각을 만들자마자 바로 기록하고 (전체 문서를 메모리에 모으지 않음),
+    # 없으면 메모리 버퍼(StringIO)에 기록했다가 마지막에 문자열로 반환
+    # (조각 리스트를 들고 있다가 join하면 조각과 결과 문자열이 동시에 메모리에 올라감)
+    if out is None:
+        buffer = io.StringIO()
+        emit = buffer.write
+    else:
+        emit = out.write
+
+    # HTML 템플릿 시작
+    emit(f"""
+    <!DOCTYPE html>
+    <html lang="ko">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>{report_title}</title>
+        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css">""")
+    emit(_REPORT_STYLE)
+    emit(f"""
+        <!-- 인라인 차트(선/점)만 쓰므로 basic 번들, 첫 화면 렌더링을 막지 않도록 defer -->
+        <script defer src="https://cdn.plot.ly/plotly-basic-latest.min.js"></script>
     </head>
     <body>
         <div class="container">
@@ -1120,9 +1624,25 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 </svg>
                 {report_title}
             </h1>
-            <div class="date">생성일: {datetime.now().strftime('%Y년 %m월 %d일 %H:%M')}</div>
-            <div class="date">데이터 기간: {months[0][:4]}년 {months[0][5:]}월 ~ {months[-1][:4]}년 {months[-1][5:]}월 (총 {len(months)}개월)</div>
-    """
+            <div class="date">생성일: {generated_at}</div>
+            <div class="date">데이터 기간: {period_str}</div>
+    """)
+
+    # 스파크라인/차트용 N개월 이동평균과 분류용 보정 이동평균을 전체 약품에 대해 한 번만 계산
+    # (분류된 각 섹션 DataFrame에도 컬럼으로 따라가므로 섹션마다 다시 계산하지 않음)
+    ts_matrix = stack_timeseries(df['월별_조제수량_리스트'])
+    corrected_ma, usage_months, is_corrected = get_corrected_ma_array(ts_matrix, ma_months)
+    # 약품코드는 행마다 str()로 바꾸지 않도록 여기서 한 번에 문자열로 맞춤
+    df = df.assign(
+        약품코드=df['약품코드'].astype(str),
+        _이동평균_리스트=calculate_custom_ma_rows(ts_matrix, ma_months),
+        _보정_이동평균=corrected_ma,
+        _사용기간=usage_months,
+        _신규여부=is_corrected,
+    )
+
+    # 같은 모양의 스파크라인을 문서에 한 번만 싣기 위한 보고서 단위 레지스트리
+    sparkline_registry = {}
 
     # 특수 케이스 약품 분류
     urgent_drugs, dead_stock_drugs, negative_stock_drugs = classify_drugs_by_special_cases(df, ma_months)
@@ -1136,15 +1656,25 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
     dead_count = len(dead_stock_drugs) if not dead_stock_drugs.empty else 0
     negative_count = len(negative_stock_drugs) if not negative_stock_drugs.empty else 0
 
-    # 숨김 처리된 약품 수 (체크된 항목)
+    # 분포 막대/범례용 비율 문자열 (빈 DataFrame이어도 0으로 나누지 않도록)
+    safe_total = total_count or 1
+    urgent_pct, low_pct, high_pct, excess_pct, dead_pct = (
+        f"{count / safe_total * 100:.1f}"
+        for count in (urgent_count, low_count, high_count, excess_count, dead_count)
+    )
+
+    # 체크된 항목/처리 상태/메모는 보고서당 한 번만 읽어 모든 섹션과 메인 테이블에 넘김
     checked_items = checked_items_db.get_checked_items()
     checked_items_status = checked_items_db.get_checked_items_with_status()
+    memos = drug_memos_db.get_all_memos()
+
+    # 숨김 처리된 약품 수 (체크된 항목)
     hidden_count = len(checked_items)
     pending_count = sum(1 for s in checked_items_status.values() if s == '대기중')
 
     # 음수 재고 경고 배너 (음수 재고가 있을 때만 표시)
     if negative_count > 0:
-        html_content += f"""
+        emit(f"""
         <!-- 음수 재고 경고 배너 -->
         <div id="negative-stock-banner" class="alert-banner alert-banner-danger">
             <div style="display: flex; align-items: center; gap: var(--space-3);">
@@ -1160,10 +1690,10 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 확인하기
             </button>
         </div>
-        """
+        """)
 
     # 통합 인디케이터 생성
-    html_content += f"""
+    emit(f"""
         <!-- 통합 재고 현황 인디케이터 -->
         <div class="status-distribution">
             <div class="status-distribution-header">
@@ -1181,42 +1711,42 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 </button>
             </div>
             <div id="proportion-graph" class="distribution-bar" data-total="{total_count}">
-                <div id="proportion-bar-urgent" style="background: var(--color-danger); flex: {urgent_count};" title="긴급: {urgent_count}개 ({urgent_count/total_count*100:.1f}%)" onclick="openCategoryModal('urgent-modal')">
+                <div id="proportion-bar-urgent" class="dist-urgent" style="flex: {urgent_count};" title="긴급: {urgent_count}개 ({urgent_pct}%)" onclick="openCategoryModal('urgent-modal')">
                     {urgent_count if urgent_count > 0 else ''}
                 </div>
-                <div id="proportion-bar-low" style="background: var(--color-warning); flex: {low_count};" title="부족: {low_count}개 ({low_count/total_count*100:.1f}%)" onclick="openCategoryModal('low-modal')">
+                <div id="proportion-bar-low" class="dist-low" style="flex: {low_count};" title="부족: {low_count}개 ({low_pct}%)" onclick="openCategoryModal('low-modal')">
                     {low_count if low_count > 0 else ''}
                 </div>
-                <div id="proportion-bar-high" style="background: var(--color-success); flex: {high_count};" title="충분: {high_count}개 ({high_count/total_count*100:.1f}%)" onclick="openCategoryModal('high-modal')">
+                <div id="proportion-bar-high" class="dist-high" style="flex: {high_count};" title="충분: {high_count}개 ({high_pct}%)" onclick="openCategoryModal('high-modal')">
                     {high_count if high_count > 0 else ''}
                 </div>
-                <div id="proportion-bar-excess" style="background: var(--color-info); flex: {excess_count};" title="과다: {excess_count}개 ({excess_count/total_count*100:.1f}%)" onclick="openCategoryModal('excess-modal')">
+                <div id="proportion-bar-excess" class="dist-excess" style="flex: {excess_count};" title="과다: {excess_count}개 ({excess_pct}%)" onclick="openCategoryModal('excess-modal')">
                     {excess_count if excess_count > 0 else ''}
                 </div>
-                <div id="proportion-bar-dead" style="background: var(--text-muted); flex: {dead_count};" title="악성재고: {dead_count}개 ({dead_count/total_count*100:.1f}%)" onclick="openCategoryModal('dead-modal')">
+                <div id="proportion-bar-dead" class="dist-dead" style="flex: {dead_count};" title="악성재고: {dead_count}개 ({dead_pct}%)" onclick="openCategoryModal('dead-modal')">
                     {dead_count if dead_count > 0 else ''}
                 </div>
             </div>
             <div class="distribution-legend">
                 <div class="legend-item">
-                    <span class="legend-dot" style="background: var(--color-danger);"></span>
-                    <span id="proportion-label-urgent">긴급: {urgent_count}개 ({urgent_count/total_count*100:.1f}%)</span>
+                    <span class="legend-dot dist-urgent"></span>
+                    <span id="proportion-label-urgent">긴급: {urgent_count}개 ({urgent_pct}%)</span>
                 </div>
                 <div class="legend-item">
-                    <span class="legend-dot" style="background: var(--color-warning);"></span>
-                    <span id="proportion-label-low">부족: {low_count}개 ({low_count/total_count*100:.1f}%)</span>
+                    <span class="legend-dot dist-low"></span>
+                    <span id="proportion-label-low">부족: {low_count}개 ({low_pct}%)</span>
                 </div>
                 <div class="legend-item">
-                    <span class="legend-dot" style="background: var(--color-success);"></span>
-                    <span id="proportion-label-high">충분: {high_count}개 ({high_count/total_count*100:.1f}%)</span>
+                    <span class="legend-dot dist-high"></span>
+                    <span id="proportion-label-high">충분: {high_count}개 ({high_pct}%)</span>
                 </div>
                 <div class="legend-item">
-                    <span class="legend-dot" style="background: var(--color-info);"></span>
-                    <span id="proportion-label-excess">과다: {excess_count}개 ({excess_count/total_count*100:.1f}%)</span>
+                    <span class="legend-dot dist-excess"></span>
+                    <span id="proportion-label-excess">과다: {excess_count}개 ({excess_pct}%)</span>
                 </div>
                 <div class="legend-item">
-                    <span class="legend-dot" style="background: var(--text-muted);"></span>
-                    <span id="proportion-label-dead">악성재고: {dead_count}개 ({dead_count/total_count*100:.1f}%)</span>
+                    <span class="legend-dot dist-dead"></span>
+                    <span id="proportion-label-dead">악성재고: {dead_count}개 ({dead_pct}%)</span>
                 </div>
             </div>
         </div>
@@ -1254,7 +1784,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 <div class="bookmark-count">{hidden_count}</div>
             </div>
         </div>
-    """
+    """)
 
     # 모달 컨테이너 생성
     has_urgent = not urgent_drugs.empty
@@ -1265,8 +1795,9 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
 
     # 긴급 약품 모달
     if has_urgent:
-        urgent_section_html = generate_urgent_drugs_section(urgent_drugs, ma_months, months)
-        html_content += f"""
+        urgent_section_html = generate_urgent_drugs_section(urgent_drugs, ma_months, months, sparkline_registry,
+            checked_codes=checked_items, memos=memos, custom_thresholds=custom_thresholds)
+        emit(f"""
             <!-- 긴급 약품 모달 -->
             <div id="urgent-modal" class="category-modal">
                 <div class="category-modal-content">
@@ -1282,12 +1813,13 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     {urgent_section_html}
                 </div>
             </div>
-        """
+        """)
 
     # 재고 부족 약품 모달 (테이블 + 차트 토글)
     if has_low_runway:
-        low_section_html = generate_low_stock_section(low_drugs_df, ma_months, months, threshold_low)
-        html_content += f"""
+        low_section_html = generate_low_stock_section(low_drugs_df, ma_months, months, threshold_low, sparkline_registry,
+            checked_codes=checked_items, memos=memos, custom_thresholds=custom_thresholds)
+        emit(f"""
             <!-- 재고 부족 약품 모달 -->
             <div id="low-modal" class="category-modal">
                 <div class="category-modal-content">
@@ -1303,12 +1835,13 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     {low_section_html}
                 </div>
             </div>
-        """
+        """)
 
     # 재고 충분 약품 모달 (테이블 + 차트 토글)
     if has_high_runway:
-        high_section_html = generate_high_stock_section(high_drugs_df, ma_months, months, threshold_low, threshold_high)
-        html_content += f"""
+        high_section_html = generate_high_stock_section(high_drugs_df, ma_months, months, threshold_low, threshold_high, sparkline_registry,
+            checked_codes=checked_items, memos=memos, custom_thresholds=custom_thresholds)
+        emit(f"""
             <!-- 재고 충분 약품 모달 -->
             <div id="high-modal" class="category-modal">
                 <div class="category-modal-content">
@@ -1324,12 +1857,13 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     {high_section_html}
                 </div>
             </div>
-        """
+        """)
 
     # 과다 재고 모달 (런웨이 threshold_high 초과)
     if has_excess_runway:
-        excess_section_html = generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_high)
-        html_content += f"""
+        excess_section_html = generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_high, sparkline_registry,
+            checked_codes=checked_items, memos=memos, custom_thresholds=custom_thresholds)
+        emit(f"""
             <!-- 과다 재고 약품 모달 -->
             <div id="excess-modal" class="category-modal">
                 <div class="category-modal-content">
@@ -1345,12 +1879,13 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     {excess_section_html}
                 </div>
             </div>
-        """
+        """)
 
     # 악성 재고 모달
     if has_dead_stock:
-        dead_stock_section_html = generate_dead_stock_section(dead_stock_drugs, ma_months, months)
-        html_content += f"""
+        dead_stock_section_html = generate_dead_stock_section(dead_stock_drugs, ma_months, months, sparkline_registry,
+            checked_codes=checked_items, memos=memos, custom_thresholds=custom_thresholds)
+        emit(f"""
             <!-- 악성 재고 모달 -->
             <div id="dead-modal" class="category-modal">
                 <div class="category-modal-content">
@@ -1366,13 +1901,14 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     {dead_stock_section_html}
                 </div>
             </div>
-        """
+        """)
 
     # 음수 재고 모달
     has_negative_stock = not negative_stock_drugs.empty
     if has_negative_stock:
-        negative_stock_section_html = generate_negative_stock_section(negative_stock_drugs, ma_months, months)
-        html_content += f"""
+        negative_stock_section_html = generate_negative_stock_section(negative_stock_drugs, ma_months, months, sparkline_registry,
+            checked_codes=checked_items, memos=memos)
+        emit(f"""
             <!-- 음수 재고 모달 -->
             <div id="negative-modal" class="category-modal">
                 <div class="category-modal-content">
@@ -1388,11 +1924,15 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     {negative_stock_section_html}
                 </div>
             </div>
-        """
+        """)
 
     # 숨김 약품 모달 (항상 생성)
-    hidden_section_html = generate_hidden_drugs_section(df, ma_months, months)
-    html_content += f"""
+    hidden_section_html = generate_hidden_drugs_section(
+        df, ma_months, months, sparkline_registry,
+        checked_items=checked_items, checked_items_status=checked_items_status,
+        memos=memos, custom_thresholds=custom_thresholds,
+    )
+    emit(f"""
         <!-- 숨김 약품 모달 -->
         <div id="hidden-modal" class="category-modal">
             <div class="category-modal-content">
@@ -1408,32 +1948,24 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 {hidden_section_html}
             </div>
         </div>
-    """
+    """)
 
     # N개월 이동평균 계산 및 정렬 준비
     print(f"\n📊 약품 목록을 {ma_months}개월 이동평균 기준으로 정렬 중...")
 
-    # 각 약품의 N개월 이동평균 계산 (보정 버전)
-    ma_values = []
-    for _, row in df.iterrows():
-        timeseries = row['월별_조제수량_리스트']
-        latest_ma, _, _ = get_corrected_ma(timeseries, ma_months)
-        ma_values.append(latest_ma if latest_ma else 0)
-
-    # DataFrame에 N-MA 컬럼 추가
-    df_sorted = df.copy()
-    df_sorted['_temp_n_ma'] = ma_values
-
-    # N개월 이동평균 내림차순 정렬
-    df_sorted = df_sorted.sort_values('_temp_n_ma', ascending=False)
+    # 각 약품의 N개월 이동평균 (보정 버전, 위에서 계산한 _보정_이동평균 컬럼 재사용 / 사용 이력 없으면 0)
+    sort_ma = np.nan_to_num(df['_보정_이동평균'].to_numpy(dtype=float))
 
+    # N개월 이동평균 내림차순 정렬 (정렬 순서만 구해 한 번에 재배열, 같은 값은 원래 순서 유지)
     # 인덱스 재설정 (중요: 정렬 후 인덱스를 0부터 다시 매김)
-    df_sorted = df_sorted.reset_index(drop=True)
+    order = np.argsort(-sort_ma, kind='stable')
+    df_sorted = df.iloc[order].reset_index(drop=True)
+    main_ma_arr = sort_ma[order]
 
     print(f"✅ 정렬 완료: 총 {len(df_sorted)}개 약품")
 
     # 테이블 생성 (기본 숨김, 검색 시에만 표시)
-    html_content += f"""
+    emit(f"""
             <h2>
                 <svg class="icon" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                     <circle cx="11" cy="11" r="8"/><line x1="21" x2="16.65" y1="21" y2="16.65"/>
@@ -1458,66 +1990,85 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                         </tr>
                     </thead>
                     <tbody>
-    """
-
-    # 메인 테이블용 체크 상태 및 메모 로드
-    main_checked_codes = checked_items_db.get_checked_items()
-    main_memos = drug_memos_db.get_all_memos()
+    """)
+
+    # 메인 테이블용 체크 상태 및 메모 (보고서 시작 시 읽어 둔 값 재사용)
+    main_checked_codes = checked_items
+    main_memos = memos
+
+    # 인라인 차트 시계열 (약품코드 → [조제수량, 이동평균]), 모든 탭의 차트가 공유
+    chart_series = {}
+
+    # 런웨이 표시값/클래스를 루프 전에 일괄 계산 (보정된 MA 사용, MA가 0이면 "재고만 있음")
+    has_runway = main_ma_arr > 0
+    runway_months_arr = np.divide(
+        df_sorted['최종_재고수량'].to_numpy(dtype=float), main_ma_arr,
+        out=np.full(len(main_ma_arr), np.nan), where=has_runway,
+    )
+    runway_days_arr = runway_months_arr * 30.417
+    is_month_runway = runway_months_arr >= 1
+    main_runway_displays = [
+        "재고만 있음" if not ok else (f"{m:.2f}개월" if is_month else f"{d:.2f}일")
+        for ok, is_month, m, d in zip(has_runway.tolist(), is_month_runway.tolist(),
+                                      runway_months_arr.tolist(), runway_days_arr.tolist())
+    ]
+    # 1개월 미만이면서 표시값(소수 둘째 자리 반올림)이 30일 미만이면 경고
+    main_runway_classes = np.where(
+        has_runway & ~is_month_runway & (np.round(runway_days_arr, 2) < 30), 'warning', ''
+    ).tolist()
+
+    # 행별 인라인 차트 데이터 JSON을 루프 전에 일괄 직렬화 (data-chart-data 속성용 HTML 이스케이프 포함)
+    main_codes = df_sorted['약품코드'].tolist()
+    main_chart_data_jsons = [
+        html_escape(create_row_chart_data_json(
+            avg=ma_value if ma_value else 0,
+            drug_name=drug_name,
+            drug_code=drug_code,
+            ma_months=ma_months,
+            stock=int(stock),
+            runway=runway_display
+        ))
+        for drug_code, drug_name, stock, ma_value, runway_display in zip(
+            main_codes, df_sorted['약품명'], df_sorted['최종_재고수량'],
+            main_ma_arr.tolist(), main_runway_displays,
+        )
+    ]
 
     # 데이터 행 추가 + 경량 스파크라인 생성
-    for idx, row in df_sorted.iterrows():
-
-        # 경량 SVG 스파크라인 생성
-        timeseries = row['월별_조제수량_리스트']
-
-        # N개월 이동평균 계산 (스파크라인용 - 기존 방식)
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
-
-        # 보정된 N개월 이동평균 (신규 약품 보정)
-        latest_ma, usage_months, is_corrected = get_corrected_ma(timeseries, ma_months)
+    # (iterrows 대신 필요한 컬럼만 zip으로 순회, _로 시작하는 컬럼은 itertuples 필드명으로 쓸 수 없음)
+    rows = zip(
+        main_codes,
+        df_sorted['약품코드'].isin(main_checked_codes).tolist(),
+        # 표시용 약품명(30자)/제약회사(12자)는 루프 전에 일괄 자르기
+        truncate_display_series(df_sorted['약품명'], 30),
+        truncate_display_series(df_sorted['제약회사'], 12),
+        # 재고수량/이동평균 표시 문자열도 루프 전에 한 번에 포맷
+        # (보정된 N개월 이동평균은 정렬 전에 계산해 둔 컬럼을 재사용, 사용 이력 없으면 N/A)
+        list(map('{:,.0f}'.format, df_sorted['최종_재고수량'].tolist())),
+        df_sorted['월별_조제수량_리스트'],
+        df_sorted['_이동평균_리스트'],
+        ["N/A" if m != m else f"{m:.2f}" for m in df_sorted['_보정_이동평균'].tolist()],
+        df_sorted['_사용기간'].tolist(),
+        df_sorted['_신규여부'].tolist(),
+        main_runway_displays,
+        main_runway_classes,
+        main_chart_data_jsons,
+        # 경량 SVG 스파크라인은 정렬된 시계열 전체에 대해 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(df_sorted['월별_조제수량_리스트']), df_sorted['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for (drug_code, is_hidden, drug_name_display, company_display, stock_display, timeseries, ma,
+         latest_ma_display, usage_months, is_corrected, runway_display, runway_class, chart_data_json, sparkline_html) in rows:
 
         # 신규 약품 태그 (사용 기간 < 선택 기간)
-        drug_code = str(row['약품코드'])
         new_drug_tag = ""
         if is_corrected and usage_months > 0:
             new_drug_tag = f'<span class="new-drug-tag">신규<span class="help-icon" onclick="event.stopPropagation(); openNewDrugInfoModal(\'{drug_code}\', {usage_months}, {ma_months})">?</span></span>'
 
-        # 런웨이 계산 (보정된 MA 사용)
-        runway_display = "재고만 있음"  # 기본값 통일
-        if latest_ma and latest_ma > 0:
-            runway_months = row['최종_재고수량'] / latest_ma
-            if runway_months >= 1:
-                runway_display = f"{runway_months:.2f}개월"
-            else:
-                runway_days = runway_months * 30.417
-                runway_display = f"{runway_days:.2f}일"
-
-        # 런웨이 클래스 결정 (1개월 미만이면 경고)
-        runway_class = get_runway_class(runway_display)
-
-        # 인라인 차트용 데이터를 JSON으로 변환
-        chart_data_json = html_escape(create_chart_data_json(
-            months=months,
-            timeseries_data=timeseries,
-            ma_data=ma,
-            avg=latest_ma if latest_ma else 0,
-            drug_name=row['약품명'],
-            drug_code=drug_code,
-            ma_months=ma_months,
-            stock=int(row['최종_재고수량']),
-            runway=runway_display
-        ))
-
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
-
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
+        # 인라인 차트용 시계열 (행의 data-chart-data JSON은 루프 전에 일괄 생성)
+        chart_series[drug_code] = create_chart_series_entry(timeseries, ma)
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -1535,49 +2086,43 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 tooltip_text = '<br>'.join(tooltip_parts)
                 threshold_icon = f'<span class="threshold-indicator" data-tooltip="{tooltip_text}" onclick="event.stopPropagation(); showThresholdTooltip(event, this)"><svg class="icon-sm" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12.22 2h-.44a2 2 0 0 0-2 2v.18a2 2 0 0 1-1 1.73l-.43.25a2 2 0 0 1-2 0l-.15-.08a2 2 0 0 0-2.73.73l-.22.38a2 2 0 0 0 .73 2.73l.15.1a2 2 0 0 1 1 1.72v.51a2 2 0 0 1-1 1.74l-.15.09a2 2 0 0 0-.73 2.73l.22.38a2 2 0 0 0 2.73.73l.15-.08a2 2 0 0 1 2 0l.43.25a2 2 0 0 1 1 1.73V20a2 2 0 0 0 2 2h.44a2 2 0 0 0 2-2v-.18a2 2 0 0 1 1-1.73l.43-.25a2 2 0 0 1 2 0l.15.08a2 2 0 0 0 2.73-.73l.22-.39a2 2 0 0 0-.73-2.73l-.15-.08a2 2 0 0 1-1-1.74v-.5a2 2 0 0 1 1-1.74l.15-.09a2 2 0 0 0 .73-2.73l-.22-.38a2 2 0 0 0-2.73-.73l-.15.08a2 2 0 0 1-2 0l-.43-.25a2 2 0 0 1-1-1.73V4a2 2 0 0 0-2-2z"/><circle cx="12" cy="12" r="3"/></svg></span>'
 
-        # 숨김 상태 확인
-        is_hidden = drug_code in main_checked_codes
-        hidden_class = "hidden" if is_hidden else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_hidden else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_hidden else "휴지통에 넣기"
+        # 숨김 상태 확인 (숨김 여부는 루프 전에 isin으로 일괄 계산)
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_hidden]
 
         # 메모 확인
         memo = main_memos.get(drug_code, "")
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = html_escape(memo[:20] + "..." if len(memo) > 20 else memo) if memo else ""
 
-        html_content += f"""
-                        <tr class="{runway_class} clickable-row tab-clickable-row" data-drug-code="{drug_code}"
-                            data-chart-data='{chart_data_json}'
-                            onclick="toggleInlineChart(this, '{drug_code}')">
-                            <td style="text-align: center;" onclick="event.stopPropagation()">
-                                <div class="checkbox-memo-container">
-                                    <button class="visibility-btn {hidden_class}" data-drug-code="{drug_code}"
-                                            onclick="event.stopPropagation(); toggleVisibility(this, '{drug_code}')"
-                                            title="{hidden_title}">{hidden_icon}</button>
-                                    <button class="memo-btn {memo_btn_class}"
-                                            data-drug-code="{drug_code}"
-                                            onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                            title="{memo_preview if memo else '메모 추가'}">
-                                        ✎
-                                    </button>
-                                </div>
-                            </td>
-                            <td>{threshold_icon}{drug_name_display}</td>
-                            <td>{company_display}</td>
-                            <td>{drug_code}</td>
-                            <td>{row['최종_재고수량']:,.0f}</td>
-                            <td>{"N/A" if latest_ma is None else f"{latest_ma:.2f}"}{new_drug_tag}</td>
-                            <td class="runway-cell">{runway_display}</td>
-                            <td>{sparkline_html}</td>
-                        </tr>
-        """
+        emit(_MAIN_ROW_TEMPLATE.format(
+            runway_class=runway_class,
+            drug_code=drug_code,
+            chart_data_json=chart_data_json,
+            hidden_class=hidden_class,
+            hidden_title=hidden_title,
+            hidden_icon=hidden_icon,
+            memo_btn_class=memo_btn_class,
+            memo_title=memo_button_title(memo, 20),
+            threshold_icon=threshold_icon,
+            drug_name_display=drug_name_display,
+            company_display=company_display,
+            stock_display=stock_display,
+            latest_ma_display=latest_ma_display,
+            new_drug_tag=new_drug_tag,
+            runway_display=runway_display,
+            sparkline_html=sparkline_html,
+        ))
 
     # HTML 마무리
     # 메모 데이터를 JSON으로 변환
-    main_memos_json = json.dumps(main_memos, ensure_ascii=False)
-
-    html_content += """
+    main_memos_json = dumps_json(main_memos)
+    # 겨울철 배경 영역 (모든 약품 공통)
+    winter_shapes_json = dumps_json(get_winter_shapes(months))
+    # 인라인 차트 시계열 페이로드 (</script> 조기 종료 방지)
+    chart_series_json = dumps_json(
+        {'months': months, 'series': chart_series}
+    ).replace('</', '<\\/')
+
+    emit("""
                     </tbody>
                 </table>
             </div>
@@ -1587,6 +2132,12 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
             // 전역 메모 데이터 (window 객체에 저장하여 중복 선언 방지)
             window.drugMemos = window.drugMemos || """ + main_memos_json + """;
 
+            // 인라인 차트 겨울철 배경 영역 (서버에서 미리 계산)
+            const WINTER_SHAPES = """ + winter_shapes_json + """;
+
+            // 인라인 차트 시계열 (월 목록 1회 + 약품코드별 [조제수량, 이동평균])
+            const CHART_SERIES = """ + chart_series_json + """;
+
             // 개별 임계값 툴팁 관련 변수
             var floatingTooltip = null;
             var activeIndicator = null;
@@ -1676,7 +2227,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 // 테이블 정렬 (숨김 항목 하단으로)
                 const tbody = modal.querySelector('tbody');
                 if (tbody) {
-                    sortTableByHiddenState(tbody);
+                    scheduleSort(tbody);
                 }
 
                 // 숨김 탭인 경우 빈 메시지 업데이트
@@ -1733,31 +2284,66 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 }
             }
 
+            // 약품코드별 대기 중인 숨김 토글 { checked, timer, controller }
+            // 연속 클릭은 250ms 동안 모아서 마지막 상태만 서버에 전송
+            const TOGGLE_DEBOUNCE_MS = 250;
+            const pendingToggles = new Map();
+
             // 숨김 토글 핸들러 (통합)
             function toggleVisibility(btn, drugCode) {
-                const row = btn.closest('tr');
-                const isCurrentlyHidden = btn.classList.contains('hidden');
-                const newHiddenState = !isCurrentlyHidden;
+                const pending = pendingToggles.get(drugCode);
+                const savedHiddenState = btn.classList.contains('hidden');
+                const currentState = pending ? pending.checked : savedHiddenState;
+                const newHiddenState = !currentState;
+
+                if (pending) {
+                    clearTimeout(pending.timer);
+                    // 이전 요청이 전송 중이면 취소 (마지막 상태만 반영)
+                    if (pending.controller) pending.controller.abort();
+                }
+
+                // 저장된 상태로 되돌린 경우 요청 불필요
+                if (newHiddenState === savedHiddenState && !(pending && pending.controller)) {
+                    pendingToggles.delete(drugCode);
+                    return;
+                }
+
+                const entry = { checked: newHiddenState, timer: null, controller: null };
+                entry.timer = setTimeout(() => flushToggle(drugCode, entry), TOGGLE_DEBOUNCE_MS);
+                pendingToggles.set(drugCode, entry);
+            }
+
+            // 대기 중인 숨김 상태를 서버에 저장
+            function flushToggle(drugCode, entry) {
+                entry.timer = null;
+                entry.controller = new AbortController();
 
-                // 서버에 숨김 상태 저장
                 fetch('/api/toggle_checked_item', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
                         drug_code: drugCode,
-                        checked: newHiddenState
-                    })
+                        checked: entry.checked
+                    }),
+                    signal: entry.controller.signal
                 })
                 .then(response => response.json())
                 .then(data => {
+                    // 그 사이 새 클릭이 있었으면 무시 (최신 요청만 UI에 반영)
+                    if (pendingToggles.get(drugCode) !== entry) return;
+                    pendingToggles.delete(drugCode);
                     if (data.status === 'success') {
                         // 모든 탭에서 같은 약품의 상태 동기화
-                        syncVisibilityState(drugCode, newHiddenState);
+                        syncVisibilityState(drugCode, entry.checked);
                         // 숨김 탭 카운트 업데이트
                         updateHiddenCount();
                     }
                 })
-                .catch(error => console.error('API 요청 실패:', error));
+                .catch(error => {
+                    if (error.name === 'AbortError') return;
+                    if (pendingToggles.get(drugCode) === entry) pendingToggles.delete(drugCode);
+                    console.error('API 요청 실패:', error);
+                });
             }
 
             // 모든 탭에서 같은 약품의 숨김 상태 동기화
@@ -1800,7 +2386,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     if (row && !isInHiddenTable) {
                         const tbody = row.closest('tbody');
                         if (tbody) {
-                            sortTableByHiddenState(tbody);
+                            scheduleSort(tbody);
                         }
                     }
                 });
@@ -1810,15 +2396,37 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 updateProportionGraph();
             }
 
+            // 정렬 예약된 tbody 목록 (fastdom 방식: 한 프레임 안의 여러 요청을 한 번의 정렬로 합침)
+            const pendingSortBodies = new Set();
+            let sortScheduled = false;
+
+            // 다음 애니메이션 프레임에 테이블 정렬 예약
+            function scheduleSort(tbody) {
+                pendingSortBodies.add(tbody);
+                if (sortScheduled) return;
+                sortScheduled = true;
+                requestAnimationFrame(() => {
+                    sortScheduled = false;
+                    const bodies = Array.from(pendingSortBodies);
+                    pendingSortBodies.clear();
+                    bodies.forEach(sortTableByHiddenState);
+                });
+            }
+
             // 테이블 정렬: 숨김 처리된 행을 하단으로 이동
             function sortTableByHiddenState(tbody) {
-                const rows = Array.from(tbody.querySelectorAll('tr:not(.inline-chart-row)'));
-                rows.sort((a, b) => {
-                    const aHidden = a.classList.contains('hidden-row') ? 1 : 0;
-                    const bHidden = b.classList.contains('hidden-row') ? 1 : 0;
-                    return aHidden - bHidden;
+                const rows = tbody.querySelectorAll('tr:not(.inline-chart-row)');
+                // 읽기 단계: 숨김 여부를 한 번씩만 확인해 보이는 행/숨긴 행으로 분리 (기존 순서 유지)
+                const visibleRows = [];
+                const hiddenRows = [];
+                rows.forEach(row => {
+                    (row.classList.contains('hidden-row') ? hiddenRows : visibleRows).push(row);
                 });
-                rows.forEach(row => tbody.appendChild(row));
+                // 쓰기 단계: DOM 밖의 fragment에 모은 뒤 한 번에 붙여 행마다 레이아웃이 무효화되지 않도록 함
+                const fragment = document.createDocumentFragment();
+                visibleRows.forEach(row => fragment.appendChild(row));
+                hiddenRows.forEach(row => fragment.appendChild(row));
+                tbody.appendChild(fragment);
             }
 
             // 각 탭별 카운트 업데이트 (숨김 처리 안된 항목만 카운트)
@@ -2035,7 +2643,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
 
                             // 모든 테이블 정렬 (숨김 항목 하단으로)
                             document.querySelectorAll('table tbody').forEach(tbody => {
-                                sortTableByHiddenState(tbody);
+                                scheduleSort(tbody);
                             });
                             updateHiddenCount();
                             updateProportionGraph();
@@ -2051,7 +2659,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                             }
                         });
                         document.querySelectorAll('table tbody').forEach(tbody => {
-                            sortTableByHiddenState(tbody);
+                            scheduleSort(tbody);
                         });
                         updateHiddenCount();
                         updateProportionGraph();
@@ -2068,7 +2676,39 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
             }
 
             // 인라인 차트 토글 (탭 내 테이블용)
-            var inlineChartCache = {};
+            // 차트 div는 한 번만 만들고 열 때마다 새 차트 행으로 옮겨 Plotly.react로 갱신 (SVG 재생성 방지)
+            let inlineChartDiv = null;
+
+            // 인라인 차트 레이아웃 중 약품과 무관한 고정 부분
+            const INLINE_CHART_BASE_LAYOUT = Object.freeze({
+                height: 350,
+                margin: { t: 30, b: 50, l: 60, r: 100 },
+                hovermode: 'x unified',
+                plot_bgcolor: '#ffffff',
+                paper_bgcolor: '#f4f4f5',
+                font: {size: 11, color: '#52525b'}
+            });
+
+            // 인라인 차트 trace별 고정 스타일 (실제 조제수량 / 이동평균 / 현재 재고)
+            const INLINE_CHART_TRACE_STYLES = Object.freeze({
+                actual: Object.freeze({
+                    mode: 'lines+markers',
+                    name: '실제 조제수량',
+                    line: {color: '#52525b', width: 2, dash: 'dot'},
+                    marker: {size: 6, color: '#52525b'},
+                    hovertemplate: '실제 조제수량: %{y:,.0f}개<extra></extra>'
+                }),
+                ma: Object.freeze({
+                    mode: 'lines',
+                    line: {color: '#475569', width: 3}
+                }),
+                stock: Object.freeze({
+                    mode: 'lines',
+                    name: '현재 재고',
+                    line: {color: '#ef4444', width: 2, dash: 'dash'},
+                    hovertemplate: '현재 재고: %{y:,.0f}개<extra></extra>'
+                })
+            });
 
             function toggleInlineChart(row, drugCode) {
                 const existingChartRow = row.nextElementSibling;
@@ -2092,6 +2732,13 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 }
 
                 const chartData = JSON.parse(chartDataStr);
+                // 행에는 탭별 값만 있으므로 공유 페이로드에서 시계열을 채움
+                const series = CHART_SERIES.series[drugCode] || [[], []];
+                chartData.months = CHART_SERIES.months;
+                // 조제수량은 결측이 없으므로 Float64Array로 넘겨 Plotly의 숫자 변환을 생략
+                // (이동평균은 앞쪽 구간이 null이므로 일반 배열 유지)
+                chartData.timeseries = Float64Array.from(series[0]);
+                chartData.ma = series[1];
                 const colSpan = row.cells.length;
 
                 // 차트 행 생성
@@ -2127,84 +2774,75 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 row.after(chartRow);
                 row.classList.add('chart-expanded');
 
-                // Plotly 차트 생성
-                renderInlineChart(drugCode, chartData);
+                // Plotly 차트 생성 (다음 프레임에 마지막으로 연 차트만 그림)
+                scheduleInlineChart(drugCode, chartData);
+            }
+
+            // 같은 프레임 안에 여러 행을 연달아 클릭하면 마지막 차트 하나만 렌더링
+            let pendingInlineChart = null;
+
+            function scheduleInlineChart(drugCode, chartData) {
+                const scheduled = pendingInlineChart !== null;
+                pendingInlineChart = {drugCode: drugCode, chartData: chartData};
+                if (scheduled) return;
+                requestAnimationFrame(() => {
+                    const pending = pendingInlineChart;
+                    pendingInlineChart = null;
+                    // 그 사이 닫힌 차트 행이면 renderInlineChart가 자리 표시자를 찾지 못하고 건너뜀
+                    renderInlineChart(pending.drugCode, pending.chartData);
+                });
             }
 
             function renderInlineChart(drugCode, chartData) {
-                const chartContainer = document.getElementById('inline-chart-' + drugCode);
-                if (!chartContainer) return;
+                const placeholder = document.getElementById('inline-chart-' + drugCode);
+                if (!placeholder) return;
+
+                // Plotly(defer)가 아직 로드되지 않았으면 페이지 로드 후 다시 그림
+                if (typeof Plotly === 'undefined') {
+                    window.addEventListener('load', () => renderInlineChart(drugCode, chartData), {once: true});
+                    return;
+                }
+
+                // 이전에 그린 차트 div가 있으면 재사용
+                let chartContainer = placeholder;
+                if (inlineChartDiv) {
+                    inlineChartDiv.id = placeholder.id;
+                    placeholder.replaceWith(inlineChartDiv);
+                    chartContainer = inlineChartDiv;
+                } else {
+                    inlineChartDiv = placeholder;
+                }
 
                 const maClean = chartData.ma;
 
                 // 현재 재고 수평선 데이터
                 const currentStock = chartData.stock || 0;
-                const stockLine = chartData.months.map(() => currentStock);
-
-                // 최대값 찾기
-                const maxValue = Math.max(...chartData.timeseries);
-                const maxIndex = chartData.timeseries.indexOf(maxValue);
+                const stockLine = new Float64Array(chartData.months.length).fill(currentStock);
+
+                // 최대값 찾기 (한 번의 순회로 값과 위치를 함께 구함, 스프레드 인자 제한 회피)
+                const timeseries = chartData.timeseries;
+                let maxValue = -Infinity;
+                let maxIndex = -1;
+                for (let i = 0; i < timeseries.length; i++) {
+                    if (timeseries[i] > maxValue) {
+                        maxValue = timeseries[i];
+                        maxIndex = i;
+                    }
+                }
                 const maxMonth = chartData.months[maxIndex];
 
                 const traces = [
+                    {...INLINE_CHART_TRACE_STYLES.actual, x: chartData.months, y: chartData.timeseries},
                     {
-                        x: chartData.months,
-                        y: chartData.timeseries,
-                        mode: 'lines+markers',
-                        name: '실제 조제수량',
-                        line: {color: '#52525b', width: 2, dash: 'dot'},
-                        marker: {size: 6, color: '#52525b'},
-                        hovertemplate: '실제 조제수량: %{y:,.0f}개<extra></extra>'
-                    },
-                    {
+                        ...INLINE_CHART_TRACE_STYLES.ma,
                         x: chartData.months,
                         y: maClean,
-                        mode: 'lines',
                         name: chartData.ma_months + '개월 이동평균',
-                        line: {color: '#475569', width: 3},
                         hovertemplate: chartData.ma_months + '개월 이동평균: %{y:,.2f}개<extra></extra>'
                     },
-                    {
-                        x: chartData.months,
-                        y: stockLine,
-                        mode: 'lines',
-                        name: '현재 재고',
-                        line: {color: '#ef4444', width: 2, dash: 'dash'},
-                        hovertemplate: '현재 재고: %{y:,.0f}개<extra></extra>'
-                    }
+                    {...INLINE_CHART_TRACE_STYLES.stock, x: chartData.months, y: stockLine}
                 ];
 
-                // 겨울철 배경 영역 생성
-                const winterShapes = [];
-                function isWinterMonth(month) {
-                    const monthNum = parseInt(month.split('-')[1]);
-                    return monthNum === 10 || monthNum === 11 || monthNum === 12 || monthNum === 1 || monthNum === 2;
-                }
-
-                let winterStart = null;
-                for (let i = 0; i < chartData.months.length; i++) {
-                    const isWinter = isWinterMonth(chartData.months[i]);
-                    if (isWinter && winterStart === null) {
-                        winterStart = i;
-                    } else if (!isWinter && winterStart !== null) {
-                        winterShapes.push({
-                            type: 'rect', xref: 'x', yref: 'paper',
-                            x0: chartData.months[winterStart], x1: chartData.months[i - 1],
-                            y0: 0, y1: 1,
-                            fillcolor: 'rgba(135, 206, 250, 0.2)', line: {width: 0}, layer: 'below'
-                        });
-                        winterStart = null;
-                    }
-                }
-                if (winterStart !== null) {
-                    winterShapes.push({
-                        type: 'rect', xref: 'x', yref: 'paper',
-                        x0: chartData.months[winterStart], x1: chartData.months[chartData.months.length - 1],
-                        y0: 0, y1: 1,
-                        fillcolor: 'rgba(135, 206, 250, 0.2)', line: {width: 0}, layer: 'below'
-                    });
-                }
-
                 // annotations 생성
                 const annotations = [];
                 if (maxValue > 0) {
@@ -2228,20 +2866,16 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     font: {color: '#ef4444', size: 10}
                 });
 
+                // 축 객체는 Plotly가 range 등을 기록하므로 호출마다 새로 생성
                 const layout = {
+                    ...INLINE_CHART_BASE_LAYOUT,
                     xaxis: { title: '월', type: 'category', showgrid: true, gridcolor: '#e4e4e7' },
                     yaxis: { title: '조제수량', showgrid: true, gridcolor: '#e4e4e7' },
-                    height: 350,
-                    margin: { t: 30, b: 50, l: 60, r: 100 },
-                    hovermode: 'x unified',
-                    plot_bgcolor: '#ffffff',
-                    paper_bgcolor: '#f4f4f5',
-                    font: {size: 11, color: '#52525b'},
-                    shapes: winterShapes,
+                    shapes: WINTER_SHAPES,
                     annotations: annotations
                 };
 
-                Plotly.newPlot(chartContainer, traces, layout, {displayModeBar: false, responsive: true});
+                Plotly.react(chartContainer, traces, layout, {displayModeBar: false, responsive: true});
             }
 
             // 범용 메모 모달 열기 (카테고리 없이 약품코드만 사용)
@@ -2250,9 +2884,8 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 const drugCodeElement = document.getElementById('memo-drug-code-generic');
                 const textarea = document.getElementById('memo-textarea-generic');
 
-                // 전역 메모 데이터에서 가져오기 (window 객체 또는 지역 변수)
-                const memos = window.drugMemos || (typeof drugMemos !== 'undefined' ? drugMemos : {});
-                const memo = memos[drugCode] || '';
+                // 전역 메모 데이터에서 가져오기
+                const memo = window.drugMemos[drugCode] || '';
 
                 drugCodeElement.textContent = drugCode;
                 textarea.value = memo;
@@ -2267,37 +2900,47 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 modal.style.display = 'none';
             }
 
-            // 범용 메모 저장 (카테고리 없이)
-            function saveMemoGeneric() {
-                const textarea = document.getElementById('memo-textarea-generic');
-                const drugCode = textarea.getAttribute('data-drug-code');
-                const memo = textarea.value;
+            // 약품코드별 전송 중인 메모 저장 요청 (새 저장 시 이전 요청 취소)
+            const memoSaveControllers = new Map();
 
-                fetch('/api/update_memo', {
+            // 메모 저장 요청 (같은 약품의 이전 요청은 취소하여 마지막 내용만 반영)
+            function postMemo(drugCode, memo) {
+                const prev = memoSaveControllers.get(drugCode);
+                if (prev) prev.abort();
+                const controller = new AbortController();
+                memoSaveControllers.set(drugCode, controller);
+
+                return fetch('/api/update_memo', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
                         drug_code: drugCode,
                         memo: memo
-                    })
+                    }),
+                    signal: controller.signal
                 })
                 .then(response => response.json())
+                .finally(() => {
+                    if (memoSaveControllers.get(drugCode) === controller) {
+                        memoSaveControllers.delete(drugCode);
+                    }
+                });
+            }
+
+            // 범용 메모 저장 (카테고리 없이)
+            function saveMemoGeneric() {
+                const textarea = document.getElementById('memo-textarea-generic');
+                const drugCode = textarea.getAttribute('data-drug-code');
+                const memo = textarea.value;
+
+                postMemo(drugCode, memo)
                 .then(data => {
                     if (data.status === 'success') {
-                        // 전역 메모 데이터 업데이트 (window 객체 및 지역 변수 모두)
-                        if (window.drugMemos) {
-                            if (memo) {
-                                window.drugMemos[drugCode] = memo;
-                            } else {
-                                delete window.drugMemos[drugCode];
-                            }
-                        }
-                        if (typeof drugMemos !== 'undefined') {
-                            if (memo) {
-                                drugMemos[drugCode] = memo;
-                            } else {
-                                delete drugMemos[drugCode];
-                            }
+                        // 전역 메모 데이터 업데이트
+                        if (memo) {
+                            window.drugMemos[drugCode] = memo;
+                        } else {
+                            delete window.drugMemos[drugCode];
                         }
 
                         // 모든 탭에서 해당 약품의 메모 버튼 스타일 업데이트
@@ -2309,6 +2952,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     }
                 })
                 .catch(error => {
+                    if (error.name === 'AbortError') return;
                     console.error('API 요청 실패:', error);
                     alert('메모 저장에 실패했습니다.');
                 });
@@ -2335,7 +2979,7 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 const textarea = document.getElementById('memo-textarea');
 
                 drugCodeElement.textContent = drugCode;
-                textarea.value = drugMemos[drugCode] || '';
+                textarea.value = window.drugMemos[drugCode] || '';
                 textarea.setAttribute('data-drug-code', drugCode);
 
                 modal.style.display = 'block';
@@ -2354,26 +2998,16 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                 const memo = textarea.value;
 
                 // 서버에 메모 저장
-                fetch('/api/update_memo', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        drug_code: drugCode,
-                        memo: memo
-                    })
-                })
-                .then(response => response.json())
+                postMemo(drugCode, memo)
                 .then(data => {
                     if (data.status === 'success') {
                         console.log('메모 저장 완료:', drugCode);
 
                         // 메모 데이터 업데이트
                         if (memo) {
-                            drugMemos[drugCode] = memo;
+                            window.drugMemos[drugCode] = memo;
                         } else {
-                            delete drugMemos[drugCode];
+                            delete window.drugMemos[drugCode];
                         }
 
                         // 모든 탭에서 메모 버튼 상태 동기화
@@ -2386,17 +3020,34 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     }
                 })
                 .catch(error => {
+                    if (error.name === 'AbortError') return;
                     console.error('API 요청 실패:', error);
                     alert('메모 저장에 실패했습니다.');
                 });
             }
 
+            // 전체 약품 테이블 행 캐시 (검색은 display만 바꾸고 행을 추가/삭제하지 않으므로 한 번만 조회)
+            let clickableRowsCache = null;
+            // 행별 검색용 소문자 텍스트 (행 순서와 동일, 첫 검색 시 한 번만 계산)
+            let searchTextsCache = null;
+            function getClickableRows() {
+                if (!clickableRowsCache) {
+                    clickableRowsCache = document.querySelectorAll('#dataTable tbody tr.clickable-row');
+                }
+                return clickableRowsCache;
+            }
+            function getSearchTexts() {
+                if (!searchTextsCache) {
+                    searchTextsCache = Array.from(getClickableRows(), row => row.textContent.toLowerCase());
+                }
+                return searchTextsCache;
+            }
+
             // 검색 기능 (검색어가 있을 때만 테이블 표시)
-            document.getElementById('searchInput').addEventListener('keyup', function() {
-                const searchValue = this.value.toLowerCase().trim();
+            function runSearch(searchValue) {
                 const tableContainer = document.getElementById('searchTableContainer');
                 const searchHint = document.getElementById('searchHint');
-                const rows = document.querySelectorAll('#dataTable tbody tr.clickable-row');
+                const rows = getClickableRows();
 
                 if (searchValue === '') {
                     // 검색어가 없으면 테이블 숨김
@@ -2407,10 +3058,10 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                     tableContainer.style.display = 'block';
                     searchHint.style.display = 'none';
 
+                    const searchTexts = getSearchTexts();
                     let visibleCount = 0;
-                    rows.forEach(row => {
-                        const text = row.textContent.toLowerCase();
-                        if (text.includes(searchValue)) {
+                    rows.forEach((row, i) => {
+                        if (searchTexts[i].includes(searchValue)) {
                             row.style.display = '';
                             visibleCount++;
                         } else {
@@ -2425,6 +3076,15 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
                         tableContainer.style.display = 'none';
                     }
                 }
+            }
+
+            // 입력이 120ms 동안 멈췄을 때만 검색 실행
+            const SEARCH_DEBOUNCE_MS = 120;
+            let searchTimer = null;
+            document.getElementById('searchInput').addEventListener('input', function() {
+                const searchValue = this.value.toLowerCase().trim();
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => runSearch(searchValue), SEARCH_DEBOUNCE_MS);
             });
 
             // 검색어 초기화 시 힌트 복원
@@ -2514,20 +3174,58 @@ def generate_html_report(df, months, mode='dispense', ma_months=3, threshold_low
         </div>
     </body>
     </html>
+    """)
+
+    if out is not None:
+        return None
+    return buffer.getvalue()
+
+def truncate_display_series(values, max_len, default="정보없음"):
+    """
+    표시용 문자열 컬럼을 한 번에 자르고 HTML 이스케이프 (max_len자 초과 시 '...' 추가)
+
+    길이는 원문 기준으로 자른 뒤 이스케이프하므로, 결과는 행 템플릿에 그대로 넣으면 된다.
+
+    Args:
+        values: 약품명/제약회사 등 문자열 Series (결측값은 default로 대체)
+        max_len: 최대 표시 길이
+
+    Returns:
+        pd.Series: 잘리고 HTML 이스케이프된 표시용 문자열
+    """
+    filled = values.fillna(default).astype(str)
+    truncated = filled.where(filled.str.len() <= max_len, filled.str.slice(0, max_len) + "...")
+    return truncated.map(html_escape)
+
+
+def ensure_ma_list_column(df, ma_months):
+    """
+    섹션 DataFrame에 스파크라인용 _이동평균_리스트 컬럼이 없으면 (직접 호출된 경우) 계산해 붙임
+
+    generate_html_report를 거치면 이미 계산된 컬럼이 따라오므로 그대로 반환
     """
+    if '_이동평균_리스트' in df.columns:
+        return df
+    return df.assign(
+        _이동평균_리스트=calculate_custom_ma_rows(stack_timeseries(df['월별_조제수량_리스트']), ma_months)
+    )
+
+
+def memo_button_title(memo, max_len=50):
+    """
+    메모 버튼 title 속성값 (메모가 없으면 문자열 처리 없이 '메모 추가')
+
+    Args:
+        memo: 메모 내용 (없으면 빈 문자열)
+        max_len: 미리보기 최대 길이
 
-    return html_content
+    Returns:
+        str: HTML 이스케이프된 메모 미리보기
+    """
+    if not memo:
+        return '메모 추가'
+    return html_escape(memo[:max_len] + '...' if len(memo) > max_len else memo)
 
-def get_runway_class(runway_display):
-    """런웨이 값에 따라 CSS 클래스 결정 (1개월 미만이면 경고)"""
-    if '일' in runway_display:
-        try:
-            days = float(runway_display.replace('일', ''))
-            if days < 30:
-                return 'warning'
-        except:
-            pass
-    return ''
 
 def classify_drugs_by_special_cases(df, ma_months):
     """특수 케이스 약품 분류
@@ -2538,52 +3236,37 @@ def classify_drugs_by_special_cases(df, ma_months):
         negative_stock_drugs: 재고가 음수인 약품 (음수 재고)
     """
 
-    # 각 약품의 N개월 이동평균 계산 (보정 버전)
-    ma_values = []
-    usage_months_list = []
-    is_corrected_list = []
-    for _, row in df.iterrows():
-        timeseries = row['월별_조제수량_리스트']
-        latest_ma, usage_months, is_corrected = get_corrected_ma(timeseries, ma_months)
-        ma_values.append(latest_ma if latest_ma else 0)
-        usage_months_list.append(usage_months)
-        is_corrected_list.append(is_corrected)
+    # 각 약품의 N개월 이동평균 (보정 버전, 사용 이력이 없으면 0)
+    latest_ma, usage_months_arr, is_corrected_arr = get_corrected_ma_columns(df, ma_months)
+    ma_arr = np.nan_to_num(latest_ma.astype(float), nan=0.0)
+
+    # 전체 DataFrame을 복사하지 않고 numpy 마스크로 분류한 뒤, 부분집합에만 계산 컬럼을 붙임
+    stock_arr = df['최종_재고수량'].to_numpy()
 
-    df_with_ma = df.copy()
-    df_with_ma['N개월_이동평균'] = ma_values
-    df_with_ma['사용기간'] = usage_months_list
-    df_with_ma['신규여부'] = is_corrected_list
+    def select_with_ma(mask):
+        return df[mask].assign(**{
+            'N개월_이동평균': ma_arr[mask],
+            '사용기간': usage_months_arr[mask],
+            '신규여부': is_corrected_arr[mask],
+        })
 
     # Case 1: 긴급 - 사용되는데 재고 없음 (N개월 이동평균 > 0 AND 재고 = 0)
-    urgent_drugs = df_with_ma[
-        (df_with_ma['N개월_이동평균'] > 0) &
-        (df_with_ma['최종_재고수량'] == 0)
-    ].copy()
+    urgent_drugs = select_with_ma((ma_arr > 0) & (stock_arr == 0))
 
     # Case 2: 악성 재고 - 안 쓰이는데 재고만 있음 (N개월 이동평균 = 0 AND 재고 > 0)
-    dead_stock_drugs = df_with_ma[
-        (df_with_ma['N개월_이동평균'] == 0) &
-        (df_with_ma['최종_재고수량'] > 0)
-    ].copy()
+    dead_stock_drugs = select_with_ma((ma_arr == 0) & (stock_arr > 0))
 
     # Case 3: 음수 재고 - 재고가 음수인 약품 (이동평균 무관)
-    negative_stock_drugs = df_with_ma[
-        df_with_ma['최종_재고수량'] < 0
-    ].copy()
+    negative_stock_drugs = select_with_ma(stock_arr < 0)
 
     # 긴급 약품: 마지막 조제월 기준으로 정렬 (최신 사용이 위로)
     if not urgent_drugs.empty:
-        # 마지막 조제 인덱스 계산 (월별_조제수량_리스트에서 마지막 0이 아닌 값의 인덱스)
-        def get_last_use_index(row):
-            timeseries = row['월별_조제수량_리스트']
-            for i in range(len(timeseries) - 1, -1, -1):
-                if timeseries[i] > 0:
-                    return i  # 마지막 사용 인덱스 (클수록 최신)
-            return -1  # 사용 기록 없음
-
-        urgent_drugs['_last_use_index'] = urgent_drugs.apply(get_last_use_index, axis=1)
-        urgent_drugs = urgent_drugs.sort_values('_last_use_index', ascending=False)  # 최신순
-        urgent_drugs = urgent_drugs.drop(columns=['_last_use_index'])
+        # 마지막 조제 인덱스 계산 (클수록 최신, 사용 기록 없으면 -1)
+        # 긴급 약품 섹션의 "마지막 조제월" 표시에도 재사용하므로 컬럼을 유지
+        last_use_indices = get_last_use_indices(stack_timeseries(urgent_drugs['월별_조제수량_리스트']))
+        urgent_drugs['_last_use_index'] = last_use_indices
+        order = np.argsort(-last_use_indices, kind='stable')  # 최신순 (같으면 기존 순서)
+        urgent_drugs = urgent_drugs.iloc[order]
 
     # 재고수량 기준 내림차순 정렬 (악성 재고 크기 순)
     if not dead_stock_drugs.empty:
@@ -2595,26 +3278,95 @@ def classify_drugs_by_special_cases(df, ma_months):
 
     return urgent_drugs, dead_stock_drugs, negative_stock_drugs
 
-def generate_urgent_drugs_section(urgent_drugs, ma_months, months):
-    """긴급 약품 섹션 HTML 생성 (테이블 형식 + 체크박스 + 메모 + 인라인 차트) - 모달용"""
-    import json
-
-    # DB에서 체크된 약품 코드 목록 가져오기 (카테고리 없이)
-    checked_codes = checked_items_db.get_checked_items()
-
-    # 메모 목록 가져오기 (카테고리 없이)
-    memos = drug_memos_db.get_all_memos()
-
-    # 개별 임계값 로드
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
-
-    html = f"""
-                    <div style="padding: var(--space-4); background: var(--color-danger-light); border-radius: var(--radius-lg); margin-bottom: var(--space-4); display: flex; align-items: center; gap: var(--space-3);">
-                        <svg class="icon" style="color: var(--color-danger); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                            <path d="m21.73 18-8-14a2 2 0 0 0-3.48 0l-8 14A2 2 0 0 0 4 21h16a2 2 0 0 0 1.73-3Z"/><line x1="12" x2="12" y1="9" y2="13"/><line x1="12" x2="12.01" y1="17" y2="17"/>
-                        </svg>
-                        <p style="margin: 0; color: var(--color-danger-dark); font-weight: 600;">
-                            총 {len(urgent_drugs)}개 약품이 현재 사용되고 있으나 재고가 소진되었습니다. 즉시 주문이 필요합니다!
+# 긴급 약품 테이블 행 템플릿 (행마다 f-string을 다시 조립하지 않도록 한 번만 정의)
+_URGENT_ROW_TEMPLATE = """
+                                <tr class="urgent-row tab-clickable-row" data-drug-code="{drug_code}"
+                                    data-chart-data='{chart_data_json}'
+                                    onclick="toggleInlineChart(this, '{drug_code}')">
+                                    <td style="text-align: center;" onclick="event.stopPropagation()">
+                                        <div class="checkbox-memo-container">
+                                            <button class="visibility-btn {hidden_class}" data-drug-code="{drug_code}"
+                                                    onclick="event.stopPropagation(); toggleVisibility(this, '{drug_code}')"
+                                                    title="{hidden_title}">{hidden_icon}</button>
+                                            <button class="memo-btn {memo_btn_class}"
+                                                    data-drug-code="{drug_code}"
+                                                    onclick="event.stopPropagation(); openMemoModal('{drug_code}')"
+                                                    title="{memo_title}">
+                                                ✎
+                                            </button>
+                                        </div>
+                                    </td>
+                                    <td style="font-weight: bold;">{threshold_icon}{drug_name_display}</td>
+                                    <td>{drug_code}</td>
+                                    <td>{company_display}</td>
+                                    <td style="color: #c53030; font-weight: bold;">0</td>
+                                    <td style="color: #2d5016; font-weight: bold;">{latest_ma:.2f}{new_drug_tag}</td>
+                                    <td style="color: #c53030; font-style: italic;">재고 없음</td>
+                                    <td>{last_use_month}</td>
+                                    <td>{sparkline_html}</td>
+                                </tr>
+        """
+
+# 긴급 약품 테이블에서 서버가 바로 렌더링하는 행 수 (나머지는 브라우저 유휴 시간에 삽입)
+URGENT_INITIAL_ROWS = 50
+
+# 남은 긴급 약품 행을 requestIdleCallback으로 나눠 삽입하는 스크립트
+_URGENT_PENDING_ROWS_SCRIPT = """
+                    <script>
+                    (function() {
+                        const pendingRows = %s;
+                        const tbody = document.querySelector('#urgent-drugs-table tbody');
+                        const parser = document.createElement('template');
+                        let next = 0;
+
+                        // requestIdleCallback 미지원 브라우저(Safari 등)용 대체
+                        const idle = window.requestIdleCallback || function(cb) {
+                            return setTimeout(() => cb({ timeRemaining: () => 8 }), 1);
+                        };
+
+                        function drain(deadline) {
+                            const fragment = document.createDocumentFragment();
+                            while (next < pendingRows.length && deadline.timeRemaining() > 1) {
+                                parser.innerHTML = pendingRows[next++];
+                                const row = parser.content.firstElementChild;
+                                // 서버 렌더링 행과 동일하게 숨김 상태 반영
+                                if (row.querySelector('.visibility-btn.hidden')) {
+                                    row.classList.add('hidden-row');
+                                }
+                                fragment.appendChild(row);
+                            }
+                            tbody.appendChild(fragment);
+
+                            if (next < pendingRows.length) {
+                                idle(drain);
+                            } else {
+                                // 모든 행 삽입 완료: 정렬 및 카운트 갱신
+                                if (typeof scheduleSort === 'function') scheduleSort(tbody);
+                                if (typeof updateProportionGraph === 'function') updateProportionGraph();
+                            }
+                        }
+
+                        if (tbody) idle(drain);
+                    })();
+                    </script>
+"""
+
+# 섹션 테이블 닫는 태그 (섹션 공용)
+_SECTION_TABLE_CLOSE = """
+                            </tbody>
+                        </table>
+                    </div>
+    """
+
+
+# 긴급 섹션 안내 문구 + 테이블 헤더 템플릿
+_URGENT_HEADER_TEMPLATE = """
+                    <div style="padding: var(--space-4); background: var(--color-danger-light); border-radius: var(--radius-lg); margin-bottom: var(--space-4); display: flex; align-items: center; gap: var(--space-3);">
+                        <svg class="icon" style="color: var(--color-danger); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                            <path d="m21.73 18-8-14a2 2 0 0 0-3.48 0l-8 14A2 2 0 0 0 4 21h16a2 2 0 0 0 1.73-3Z"/><line x1="12" x2="12" y1="9" y2="13"/><line x1="12" x2="12.01" y1="17" y2="17"/>
+                        </svg>
+                        <p style="margin: 0; color: var(--color-danger-dark); font-weight: 600;">
+                            총 {count}개 약품이 현재 사용되고 있으나 재고가 소진되었습니다. 즉시 주문이 필요합니다!
                         </p>
                     </div>
                     <div class="table-container">
@@ -2635,49 +3387,101 @@ def generate_urgent_drugs_section(urgent_drugs, ma_months, months):
                             <tbody>
     """
 
-    for _, row in urgent_drugs.iterrows():
-        drug_code = str(row['약품코드'])
-        is_checked = drug_code in checked_codes
+# 메모 작성 모달 (정적 마크업)
+_MEMO_MODAL_HTML = """
+
+            <!-- 메모 모달 -->
+            <div id="memo-modal" class="modal">
+                <div class="modal-content" style="max-width: 600px;">
+                    <span class="close-btn" onclick="closeMemoModal()">&times;</span>
+                    <h2 style="margin-bottom: 20px;">📝 메모 작성</h2>
+                    <p style="color: #718096; margin-bottom: 10px;">약품코드: <strong id="memo-drug-code"></strong></p>
+                    <textarea id="memo-textarea"
+                              style="width: 100%; height: 200px; padding: 10px; border: 2px solid #e2e8f0; border-radius: 8px; font-size: 14px; font-family: inherit; resize: vertical; box-sizing: border-box;"
+                              placeholder="메모를 입력하세요..."></textarea>
+                    <div style="display: flex; justify-content: flex-end; gap: 10px; margin-top: 20px;">
+                        <button onclick="closeMemoModal()" style="padding: 10px 20px; border: 2px solid #cbd5e0; background: white; border-radius: 5px; cursor: pointer; font-size: 14px;">취소</button>
+                        <button onclick="saveMemo()" style="padding: 10px 20px; border: none; background: #4b5563; color: white; border-radius: 5px; cursor: pointer; font-size: 14px; font-weight: bold;">저장</button>
+                    </div>
+                </div>
+            </div>
+    """
 
-        # N개월 이동평균 (최신값)
-        latest_ma = row['N개월_이동평균']
 
-        # 마지막 조제월 찾기 (월별_조제수량_리스트에서 마지막 0이 아닌 값의 인덱스)
-        timeseries = row['월별_조제수량_리스트']
+def generate_urgent_drugs_section(urgent_drugs, ma_months, months, sparkline_registry=None,
+                                  checked_codes=None, memos=None, custom_thresholds=None):
+    """긴급 약품 섹션 HTML 생성 (테이블 형식 + 체크박스 + 메모 + 인라인 차트) - 모달용"""
+
+    # 체크된 약품 코드/메모/개별 임계값 (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_codes is None:
+        checked_codes = checked_items_db.get_checked_items()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+    if custom_thresholds is None:
+        custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    urgent_drugs = ensure_ma_list_column(urgent_drugs, ma_months)
+
+    # 마지막 사용 인덱스가 없으면 (직접 호출된 경우) 여기서 계산
+    if '_last_use_index' not in urgent_drugs.columns:
+        urgent_drugs = urgent_drugs.assign(
+            _last_use_index=get_last_use_indices(stack_timeseries(urgent_drugs['월별_조제수량_리스트']))
+        )
+
+    parts = [_URGENT_HEADER_TEMPLATE.format(count=len(urgent_drugs), ma_months=ma_months)]
+
+    # 표시용 약품명(30자)/제약회사(12자) 일괄 자르기
+    urgent_drugs = urgent_drugs.assign(**{
+        '_약품명_표시': truncate_display_series(urgent_drugs['약품명'], 30),
+        '_제약회사_표시': truncate_display_series(urgent_drugs['제약회사'], 12),
+    })
+
+    # 처음 URGENT_INITIAL_ROWS개 행만 tbody에 넣고 나머지는 스크립트로 지연 삽입
+    pending_rows = []
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        urgent_drugs['약품코드'],
+        urgent_drugs['약품코드'].astype(str).isin(checked_codes),
+        urgent_drugs['N개월_이동평균'],
+        urgent_drugs['월별_조제수량_리스트'],
+        urgent_drugs['_last_use_index'],
+        urgent_drugs['_약품명_표시'],
+        urgent_drugs['_제약회사_표시'],
+        urgent_drugs.get('신규여부', repeat(False)),
+        urgent_drugs.get('사용기간', repeat(0)),
+        urgent_drugs['약품명'],
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(urgent_drugs['월별_조제수량_리스트']), urgent_drugs['_이동평균_리스트'].tolist(),
+            ma_months, None,
+        ),
+    )
+    for row_idx, (drug_code, is_checked, latest_ma, timeseries, last_use_index, drug_name_display,
+                  company_display, is_new_drug, usage_months_val, drug_name, sparkline_html) in enumerate(rows):
+        drug_code = str(drug_code)
+
+        # 마지막 조제월 (classify_drugs_by_special_cases에서 계산한 마지막 사용 인덱스 기준)
         last_use_month = "N/A"
-        for i in range(len(timeseries) - 1, -1, -1):
-            if timeseries[i] > 0:
-                # i번째 월이 마지막 사용 월
-                months_ago = len(timeseries) - 1 - i
-                if months_ago == 0:
-                    last_use_month = "이번 달"
-                elif months_ago == 1:
-                    last_use_month = "지난 달"
-                else:
-                    last_use_month = f"{months_ago}개월 전"
-                break
-
-        # 스파크라인 생성
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
-
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
-
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
+        if last_use_index >= 0:
+            months_ago = len(timeseries) - 1 - last_use_index
+            if months_ago == 0:
+                last_use_month = "이번 달"
+            elif months_ago == 1:
+                last_use_month = "지난 달"
+            else:
+                last_use_month = f"{months_ago}개월 전"
+
+        # 스파크라인 공유 (지연 삽입 행은 로드 시점에 DOM에 없으므로 공유 대상에서 제외)
+        if sparkline_registry is not None and row_idx < URGENT_INITIAL_ROWS:
+            sparkline_html = share_sparkline_svg(sparkline_html, sparkline_registry)
 
         # 메모 가져오기
         memo = memos.get(drug_code, '')
-        memo_escaped = memo.replace("'", "\\'").replace('"', '&quot;').replace('\n', '\\n')
 
         # 메모 버튼 스타일 (메모가 있으면 주황색)
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -2697,31 +3501,56 @@ def generate_urgent_drugs_section(urgent_drugs, ma_months, months):
 
         # 신규 약품 태그 (데이터에 포함된 경우)
         new_drug_tag = ""
-        if row.get('신규여부', False) and row.get('사용기간', 0) > 0:
-            usage_months_val = row['사용기간']
+        if is_new_drug and usage_months_val > 0:
             new_drug_tag = f'<span class="new-drug-tag">신규<span class="help-icon" onclick="event.stopPropagation(); openNewDrugInfoModal(\'{drug_code}\', {usage_months_val}, {ma_months})">?</span></span>'
 
         # 인라인 차트용 데이터 생성
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': 0,
-            'latest_ma': latest_ma,
-            'runway': '재고 없음'
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=0,
+            latest_ma=latest_ma,
+            runway='재고 없음',
+        )
 
         # 숨김 버튼 상태
-        hidden_class = "hidden" if is_checked else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_checked else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_checked else "휴지통에 넣기"
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_checked]
 
-        html += f"""
-                                <tr class="urgent-row tab-clickable-row" data-drug-code="{drug_code}"
+        row_html = _URGENT_ROW_TEMPLATE.format(
+            drug_code=drug_code,
+            chart_data_json=chart_data_json,
+            hidden_class=hidden_class,
+            hidden_title=hidden_title,
+            hidden_icon=hidden_icon,
+            memo_btn_class=memo_btn_class,
+            memo_title=memo_button_title(memo),
+            threshold_icon=threshold_icon,
+            drug_name_display=drug_name_display,
+            company_display=company_display,
+            latest_ma=latest_ma,
+            new_drug_tag=new_drug_tag,
+            last_use_month=last_use_month,
+            sparkline_html=sparkline_html,
+        )
+        if row_idx < URGENT_INITIAL_ROWS:
+            parts.append(row_html)
+        else:
+            pending_rows.append(row_html.strip())
+
+    parts.append(_SECTION_TABLE_CLOSE)
+
+    if pending_rows:
+        # </script> 조기 종료를 막기 위해 '</'를 이스케이프
+        pending_rows_json = dumps_json(pending_rows).replace('</', '<\\/')
+        parts.append(_URGENT_PENDING_ROWS_SCRIPT % pending_rows_json)
+
+    parts.append(_MEMO_MODAL_HTML)
+
+    # 메모 데이터는 본문 스크립트의 window.drugMemos 하나만 사용 (섹션별로 다시 싣지 않음)
+    return "".join(parts)
+
+# 부족/충분/과다 약품 테이블 행 템플릿 (세 섹션이 행 클래스와 런웨이 색상만 다름)
+_RUNWAY_ROW_TEMPLATE = """
+                                <tr class="{row_class} tab-clickable-row" data-drug-code="{drug_code}"
                                     data-chart-data='{chart_data_json}'
                                     onclick="toggleInlineChart(this, '{drug_code}')">
                                     <td style="text-align: center;" onclick="event.stopPropagation()">
@@ -2731,8 +3560,8 @@ def generate_urgent_drugs_section(urgent_drugs, ma_months, months):
                                                     title="{hidden_title}">{hidden_icon}</button>
                                             <button class="memo-btn {memo_btn_class}"
                                                     data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); openMemoModal('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
+                                                    onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
+                                                    title="{memo_title}">
                                                 ✎
                                             </button>
                                         </div>
@@ -2740,68 +3569,21 @@ def generate_urgent_drugs_section(urgent_drugs, ma_months, months):
                                     <td style="font-weight: bold;">{threshold_icon}{drug_name_display}</td>
                                     <td>{drug_code}</td>
                                     <td>{company_display}</td>
-                                    <td style="color: #c53030; font-weight: bold;">0</td>
-                                    <td style="color: #2d5016; font-weight: bold;">{latest_ma:.2f}{new_drug_tag}</td>
-                                    <td style="color: #c53030; font-style: italic;">재고 없음</td>
-                                    <td>{last_use_month}</td>
+                                    <td>{stock:,.0f}</td>
+                                    <td>{latest_ma:.2f}{new_drug_tag}</td>
+                                    <td style="color: {runway_color}; font-weight: bold;">{runway_display}</td>
                                     <td>{sparkline_html}</td>
                                 </tr>
         """
 
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-
-            <!-- 메모 모달 -->
-            <div id="memo-modal" class="modal">
-                <div class="modal-content" style="max-width: 600px;">
-                    <span class="close-btn" onclick="closeMemoModal()">&times;</span>
-                    <h2 style="margin-bottom: 20px;">📝 메모 작성</h2>
-                    <p style="color: #718096; margin-bottom: 10px;">약품코드: <strong id="memo-drug-code"></strong></p>
-                    <textarea id="memo-textarea"
-                              style="width: 100%; height: 200px; padding: 10px; border: 2px solid #e2e8f0; border-radius: 8px; font-size: 14px; font-family: inherit; resize: vertical; box-sizing: border-box;"
-                              placeholder="메모를 입력하세요..."></textarea>
-                    <div style="display: flex; justify-content: flex-end; gap: 10px; margin-top: 20px;">
-                        <button onclick="closeMemoModal()" style="padding: 10px 20px; border: 2px solid #cbd5e0; background: white; border-radius: 5px; cursor: pointer; font-size: 14px;">취소</button>
-                        <button onclick="saveMemo()" style="padding: 10px 20px; border: none; background: #4b5563; color: white; border-radius: 5px; cursor: pointer; font-size: 14px; font-weight: bold;">저장</button>
-                    </div>
-                </div>
-            </div>
-    """
-
-    # 메모 데이터를 JSON으로 변환하여 JavaScript에서 사용
-    import json
-    memos_json = json.dumps(memos, ensure_ascii=False)
-
-    html += f"""
-            <script>
-                // 메모 데이터 (JavaScript 객체로 변환)
-                const drugMemos = {memos_json};
-            </script>
-    """
-
-    return html
-
-def generate_low_stock_section(low_drugs_df, ma_months, months, threshold_low=3):
-    """재고 부족 약품 섹션 HTML 생성 (테이블 형식 + 체크박스/메모 + 인라인 차트) - 모달용"""
-    import json
-
-    if low_drugs_df.empty:
-        return ""
-
-    # DB에서 체크된 약품 코드 목록 가져오기 (카테고리 없이)
-    checked_codes = checked_items_db.get_checked_items()
-    memos = drug_memos_db.get_all_memos()
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
-
-    html = f"""
+# 재고 부족 섹션 안내 문구 + 테이블 헤더 템플릿
+_LOW_STOCK_HEADER_TEMPLATE = """
                     <div style="padding: var(--space-4); background: var(--color-warning-light); border-radius: var(--radius-lg); margin-bottom: var(--space-4); display: flex; align-items: center; gap: var(--space-3);">
                         <svg class="icon" style="color: var(--color-warning-dark); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                             <path d="m21.73 18-8-14a2 2 0 0 0-3.48 0l-8 14A2 2 0 0 0 4 21h16a2 2 0 0 0 1.73-3Z"/><line x1="12" x2="12" y1="9" y2="13"/><line x1="12" x2="12.01" y1="17" y2="17"/>
                         </svg>
                         <p style="margin: 0; color: var(--color-warning-dark); font-weight: 600;">
-                            총 {len(low_drugs_df)}개 약품의 런웨이가 {threshold_low}개월 이하입니다. 재고 보충을 고려하세요.
+                            총 {count}개 약품의 런웨이가 {threshold_low}개월 이하입니다. 재고 보충을 고려하세요.
                         </p>
                     </div>
                     <div class="table-container">
@@ -2821,37 +3603,67 @@ def generate_low_stock_section(low_drugs_df, ma_months, months, threshold_low=3)
                             <tbody>
     """
 
-    for _, row in low_drugs_df.iterrows():
-        drug_code = str(row['약품코드'])
-        is_checked = drug_code in checked_codes
+
+def generate_low_stock_section(low_drugs_df, ma_months, months, threshold_low=3, sparkline_registry=None,
+                               checked_codes=None, memos=None, custom_thresholds=None):
+    """재고 부족 약품 섹션 HTML 생성 (테이블 형식 + 체크박스/메모 + 인라인 차트) - 모달용"""
+
+    if low_drugs_df.empty:
+        return ""
+
+    # 체크된 약품 코드/메모/개별 임계값 (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_codes is None:
+        checked_codes = checked_items_db.get_checked_items()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+    if custom_thresholds is None:
+        custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    low_drugs_df = ensure_ma_list_column(low_drugs_df, ma_months)
+
+    parts = [_LOW_STOCK_HEADER_TEMPLATE.format(
+        count=len(low_drugs_df), threshold_low=threshold_low, ma_months=ma_months,
+    )]
+
+    # 표시용 약품명(30자)/제약회사(12자) 일괄 자르기
+    low_drugs_df = low_drugs_df.assign(**{
+        '_약품명_표시': truncate_display_series(low_drugs_df['약품명'], 30),
+        '_제약회사_표시': truncate_display_series(low_drugs_df['제약회사'], 12),
+    })
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        low_drugs_df['약품코드'],
+        low_drugs_df['약품코드'].astype(str).isin(checked_codes),
+        low_drugs_df['런웨이_개월'],
+        low_drugs_df['약품명'],
+        low_drugs_df['_약품명_표시'],
+        low_drugs_df['_제약회사_표시'],
+        low_drugs_df.get('신규여부', repeat(False)),
+        low_drugs_df.get('사용기간', repeat(0)),
+        low_drugs_df['N개월_이동평균'],
+        low_drugs_df['최종_재고수량'],
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(low_drugs_df['월별_조제수량_리스트']), low_drugs_df['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for (drug_code, is_checked, runway_months, drug_name, drug_name_display, company_display,
+         is_new_drug, usage_months_val, latest_ma, stock, sparkline_html) in rows:
+        drug_code = str(drug_code)
 
         # 런웨이 표시
-        runway_months = row['런웨이_개월']
         if runway_months >= 1:
             runway_display = f"{runway_months:.2f}개월"
         else:
             runway_days = runway_months * 30.417
             runway_display = f"{runway_days:.2f}일"
 
-        # 스파크라인 생성
-        timeseries = row['월별_조제수량_리스트']
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
-
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
-
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
-
         # 메모 가져오기
         memo = memos.get(drug_code, '')
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -2870,96 +3682,53 @@ def generate_low_stock_section(low_drugs_df, ma_months, months, threshold_low=3)
                 threshold_icon = f'<span class="threshold-indicator" data-tooltip="{tooltip_text}" onclick="event.stopPropagation(); showThresholdTooltip(event, this)"><svg class="icon-sm" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12.22 2h-.44a2 2 0 0 0-2 2v.18a2 2 0 0 1-1 1.73l-.43.25a2 2 0 0 1-2 0l-.15-.08a2 2 0 0 0-2.73.73l-.22.38a2 2 0 0 0 .73 2.73l.15.1a2 2 0 0 1 1 1.72v.51a2 2 0 0 1-1 1.74l-.15.09a2 2 0 0 0-.73 2.73l.22.38a2 2 0 0 0 2.73.73l.15-.08a2 2 0 0 1 2 0l.43.25a2 2 0 0 1 1 1.73V20a2 2 0 0 0 2 2h.44a2 2 0 0 0 2-2v-.18a2 2 0 0 1 1-1.73l.43-.25a2 2 0 0 1 2 0l.15.08a2 2 0 0 0 2.73-.73l.22-.39a2 2 0 0 0-.73-2.73l-.15-.08a2 2 0 0 1-1-1.74v-.5a2 2 0 0 1 1-1.74l.15-.09a2 2 0 0 0 .73-2.73l-.22-.38a2 2 0 0 0-2.73-.73l-.15.08a2 2 0 0 1-2 0l-.43-.25a2 2 0 0 1-1-1.73V4a2 2 0 0 0-2-2z"/><circle cx="12" cy="12" r="3"/></svg></span>'
 
         # 숨김 버튼 상태
-        hidden_class = "hidden" if is_checked else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_checked else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_checked else "휴지통에 넣기"
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_checked]
 
         # 신규 약품 태그 (데이터에 포함된 경우)
         new_drug_tag = ""
-        if row.get('신규여부', False) and row.get('사용기간', 0) > 0:
-            usage_months_val = row['사용기간']
+        if is_new_drug and usage_months_val > 0:
             new_drug_tag = f'<span class="new-drug-tag">신규<span class="help-icon" onclick="event.stopPropagation(); openNewDrugInfoModal(\'{drug_code}\', {usage_months_val}, {ma_months})">?</span></span>'
 
         # 인라인 차트용 데이터 생성
-        latest_ma = row['N개월_이동평균']
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': int(row['최종_재고수량']),
-            'latest_ma': latest_ma,
-            'runway': runway_display
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
-
-        html += f"""
-                                <tr class="low-row tab-clickable-row" data-drug-code="{drug_code}"
-                                    data-chart-data='{chart_data_json}'
-                                    onclick="toggleInlineChart(this, '{drug_code}')">
-                                    <td style="text-align: center;" onclick="event.stopPropagation()">
-                                        <div class="checkbox-memo-container">
-                                            <button class="visibility-btn {hidden_class}" data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); toggleVisibility(this, '{drug_code}')"
-                                                    title="{hidden_title}">{hidden_icon}</button>
-                                            <button class="memo-btn {memo_btn_class}"
-                                                    data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
-                                                ✎
-                                            </button>
-                                        </div>
-                                    </td>
-                                    <td style="font-weight: bold;">{threshold_icon}{drug_name_display}</td>
-                                    <td>{drug_code}</td>
-                                    <td>{company_display}</td>
-                                    <td>{row['최종_재고수량']:,.0f}</td>
-                                    <td>{row['N개월_이동평균']:.2f}{new_drug_tag}</td>
-                                    <td style="color: #ca8a04; font-weight: bold;">{runway_display}</td>
-                                    <td>{sparkline_html}</td>
-                                </tr>
-        """
-
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-    """
-
-    # 메모 데이터를 JSON으로 변환
-    import json
-    memos_json = json.dumps(memos, ensure_ascii=False)
-
-    html += f"""
-            <script>
-                // 부족 탭 메모 데이터
-                var lowDrugMemos = {memos_json};
-            </script>
-    """
-
-    return html
-
-def generate_high_stock_section(high_drugs_df, ma_months, months, threshold_low=3, threshold_high=12):
-    """재고 충분 약품 섹션 HTML 생성 (테이블 형식 + 체크박스/메모 + 인라인 차트) - 모달용"""
-    import json
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=int(stock),
+            latest_ma=latest_ma,
+            runway=runway_display,
+        )
+
+        parts.append(_RUNWAY_ROW_TEMPLATE.format(
+            row_class="low-row",
+            runway_color="#ca8a04",
+            drug_code=drug_code,
+            chart_data_json=chart_data_json,
+            hidden_class=hidden_class,
+            hidden_title=hidden_title,
+            hidden_icon=hidden_icon,
+            memo_btn_class=memo_btn_class,
+            memo_title=memo_button_title(memo),
+            threshold_icon=threshold_icon,
+            drug_name_display=drug_name_display,
+            company_display=company_display,
+            stock=stock,
+            latest_ma=latest_ma,
+            new_drug_tag=new_drug_tag,
+            runway_display=runway_display,
+            sparkline_html=sparkline_html,
+        ))
 
-    if high_drugs_df.empty:
-        return ""
+    parts.append(_SECTION_TABLE_CLOSE)
 
-    # DB에서 체크된 약품 코드 목록 가져오기 (카테고리 없이)
-    checked_codes = checked_items_db.get_checked_items()
-    memos = drug_memos_db.get_all_memos()
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
+    return "".join(parts)
 
-    html = f"""
+# 재고 충분 섹션 안내 문구 + 테이블 헤더 템플릿
+_HIGH_STOCK_HEADER_TEMPLATE = """
                     <div style="padding: var(--space-4); background: var(--color-success-light); border-radius: var(--radius-lg); margin-bottom: var(--space-4); display: flex; align-items: center; gap: var(--space-3);">
                         <svg class="icon" style="color: var(--color-success-dark); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                             <path d="M22 11.08V12a10 10 0 1 1-5.93-9.14"/><polyline points="22 4 12 14.01 9 11.01"/>
                         </svg>
                         <p style="margin: 0; color: var(--color-success-dark); font-weight: 600;">
-                            총 {len(high_drugs_df)}개 약품의 런웨이가 {threshold_low}~{threshold_high}개월입니다. 재고가 충분합니다.
+                            총 {count}개 약품의 런웨이가 {threshold_low}~{threshold_high}개월입니다. 재고가 충분합니다.
                         </p>
                     </div>
                     <div class="table-container">
@@ -2979,33 +3748,63 @@ def generate_high_stock_section(high_drugs_df, ma_months, months, threshold_low=
                             <tbody>
     """
 
-    for _, row in high_drugs_df.iterrows():
-        drug_code = str(row['약품코드'])
-        is_checked = drug_code in checked_codes
 
-        # 런웨이 표시
-        runway_months = row['런웨이_개월']
-        runway_display = f"{runway_months:.2f}개월"
+def generate_high_stock_section(high_drugs_df, ma_months, months, threshold_low=3, threshold_high=12, sparkline_registry=None,
+                                checked_codes=None, memos=None, custom_thresholds=None):
+    """재고 충분 약품 섹션 HTML 생성 (테이블 형식 + 체크박스/메모 + 인라인 차트) - 모달용"""
 
-        # 스파크라인 생성
-        timeseries = row['월별_조제수량_리스트']
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
+    if high_drugs_df.empty:
+        return ""
 
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
+    # 체크된 약품 코드/메모/개별 임계값 (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_codes is None:
+        checked_codes = checked_items_db.get_checked_items()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+    if custom_thresholds is None:
+        custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    high_drugs_df = ensure_ma_list_column(high_drugs_df, ma_months)
+
+    parts = [_HIGH_STOCK_HEADER_TEMPLATE.format(
+        count=len(high_drugs_df), threshold_low=threshold_low, threshold_high=threshold_high, ma_months=ma_months,
+    )]
+
+    # 표시용 약품명(30자)/제약회사(12자) 일괄 자르기
+    high_drugs_df = high_drugs_df.assign(**{
+        '_약품명_표시': truncate_display_series(high_drugs_df['약품명'], 30),
+        '_제약회사_표시': truncate_display_series(high_drugs_df['제약회사'], 12),
+    })
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        high_drugs_df['약품코드'],
+        high_drugs_df['약품코드'].astype(str).isin(checked_codes),
+        high_drugs_df['런웨이_개월'],
+        high_drugs_df['약품명'],
+        high_drugs_df['_약품명_표시'],
+        high_drugs_df['_제약회사_표시'],
+        high_drugs_df.get('신규여부', repeat(False)),
+        high_drugs_df.get('사용기간', repeat(0)),
+        high_drugs_df['N개월_이동평균'],
+        high_drugs_df['최종_재고수량'],
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(high_drugs_df['월별_조제수량_리스트']), high_drugs_df['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for (drug_code, is_checked, runway_months, drug_name, drug_name_display, company_display,
+         is_new_drug, usage_months_val, latest_ma, stock, sparkline_html) in rows:
+        drug_code = str(drug_code)
 
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
+        # 런웨이 표시
+        runway_display = f"{runway_months:.2f}개월"
 
         # 메모 가져오기
         memo = memos.get(drug_code, '')
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -3024,100 +3823,55 @@ def generate_high_stock_section(high_drugs_df, ma_months, months, threshold_low=
                 threshold_icon = f'<span class="threshold-indicator" data-tooltip="{tooltip_text}" onclick="event.stopPropagation(); showThresholdTooltip(event, this)"><svg class="icon-sm" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12.22 2h-.44a2 2 0 0 0-2 2v.18a2 2 0 0 1-1 1.73l-.43.25a2 2 0 0 1-2 0l-.15-.08a2 2 0 0 0-2.73.73l-.22.38a2 2 0 0 0 .73 2.73l.15.1a2 2 0 0 1 1 1.72v.51a2 2 0 0 1-1 1.74l-.15.09a2 2 0 0 0-.73 2.73l.22.38a2 2 0 0 0 2.73.73l.15-.08a2 2 0 0 1 2 0l.43.25a2 2 0 0 1 1 1.73V20a2 2 0 0 0 2 2h.44a2 2 0 0 0 2-2v-.18a2 2 0 0 1 1-1.73l.43-.25a2 2 0 0 1 2 0l.15.08a2 2 0 0 0 2.73-.73l.22-.39a2 2 0 0 0-.73-2.73l-.15-.08a2 2 0 0 1-1-1.74v-.5a2 2 0 0 1 1-1.74l.15-.09a2 2 0 0 0 .73-2.73l-.22-.38a2 2 0 0 0-2.73-.73l-.15.08a2 2 0 0 1-2 0l-.43-.25a2 2 0 0 1-1-1.73V4a2 2 0 0 0-2-2z"/><circle cx="12" cy="12" r="3"/></svg></span>'
 
         # 숨김 버튼 상태
-        hidden_class = "hidden" if is_checked else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_checked else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_checked else "휴지통에 넣기"
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_checked]
 
         # 신규 약품 태그 (데이터에 포함된 경우)
         new_drug_tag = ""
-        if row.get('신규여부', False) and row.get('사용기간', 0) > 0:
-            usage_months_val = row['사용기간']
+        if is_new_drug and usage_months_val > 0:
             new_drug_tag = f'<span class="new-drug-tag">신규<span class="help-icon" onclick="event.stopPropagation(); openNewDrugInfoModal(\'{drug_code}\', {usage_months_val}, {ma_months})">?</span></span>'
 
         # 인라인 차트용 데이터 생성
-        latest_ma = row['N개월_이동평균']
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': int(row['최종_재고수량']),
-            'latest_ma': latest_ma,
-            'runway': runway_display
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
-
-        html += f"""
-                                <tr class="high-row tab-clickable-row" data-drug-code="{drug_code}"
-                                    data-chart-data='{chart_data_json}'
-                                    onclick="toggleInlineChart(this, '{drug_code}')">
-                                    <td style="text-align: center;" onclick="event.stopPropagation()">
-                                        <div class="checkbox-memo-container">
-                                            <button class="visibility-btn {hidden_class}" data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); toggleVisibility(this, '{drug_code}')"
-                                                    title="{hidden_title}">{hidden_icon}</button>
-                                            <button class="memo-btn {memo_btn_class}"
-                                                    data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
-                                                ✎
-                                            </button>
-                                        </div>
-                                    </td>
-                                    <td style="font-weight: bold;">{threshold_icon}{drug_name_display}</td>
-                                    <td>{drug_code}</td>
-                                    <td>{company_display}</td>
-                                    <td>{row['최종_재고수량']:,.0f}</td>
-                                    <td>{row['N개월_이동평균']:.2f}{new_drug_tag}</td>
-                                    <td style="color: #16a34a; font-weight: bold;">{runway_display}</td>
-                                    <td>{sparkline_html}</td>
-                                </tr>
-        """
-
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-    """
-
-    # 메모 데이터를 JSON으로 변환
-    memos_json = json.dumps(memos, ensure_ascii=False)
-
-    html += f"""
-            <script>
-                // 충분 탭 메모 데이터
-                var highDrugMemos = {memos_json};
-            </script>
-    """
-
-    return html
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=int(stock),
+            latest_ma=latest_ma,
+            runway=runway_display,
+        )
+
+        parts.append(_RUNWAY_ROW_TEMPLATE.format(
+            row_class="high-row",
+            runway_color="#16a34a",
+            drug_code=drug_code,
+            chart_data_json=chart_data_json,
+            hidden_class=hidden_class,
+            hidden_title=hidden_title,
+            hidden_icon=hidden_icon,
+            memo_btn_class=memo_btn_class,
+            memo_title=memo_button_title(memo),
+            threshold_icon=threshold_icon,
+            drug_name_display=drug_name_display,
+            company_display=company_display,
+            stock=stock,
+            latest_ma=latest_ma,
+            new_drug_tag=new_drug_tag,
+            runway_display=runway_display,
+            sparkline_html=sparkline_html,
+        ))
 
+    parts.append(_SECTION_TABLE_CLOSE)
 
-def generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_high=12):
-    """과다 재고 약품 섹션 HTML 생성 (테이블 형식 + 체크박스/메모 + 인라인 차트) - 모달용
+    return "".join(parts)
 
-    런웨이가 threshold_high개월을 초과하는 약품들 (유효기간 만료 위험)
-    """
-    import json
-
-    if excess_drugs_df.empty:
-        return ""
-
-    # DB에서 체크된 약품 코드 목록 가져오기 (카테고리 없이)
-    checked_codes = checked_items_db.get_checked_items()
-    memos = drug_memos_db.get_all_memos()
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
 
-    html = f"""
+# 재고 과다 섹션 안내 문구 + 테이블 헤더 템플릿
+_EXCESS_STOCK_HEADER_TEMPLATE = """
                     <div style="padding: var(--space-4); background: var(--color-info-light); border-radius: var(--radius-lg); margin-bottom: var(--space-4);">
                         <div style="display: flex; align-items: center; gap: var(--space-3); margin-bottom: var(--space-2);">
                             <svg class="icon" style="color: var(--color-info-dark); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                 <path d="M21 16V8a2 2 0 0 0-1-1.73l-7-4a2 2 0 0 0-2 0l-7 4A2 2 0 0 0 3 8v8a2 2 0 0 0 1 1.73l7 4a2 2 0 0 0 2 0l7-4A2 2 0 0 0 21 16z"/><polyline points="3.29 7 12 12 20.71 7"/><line x1="12" x2="12" y1="22" y2="12"/>
                             </svg>
                             <p style="margin: 0; color: var(--color-info-dark); font-weight: 600;">
-                                총 {len(excess_drugs_df)}개 약품의 런웨이가 {threshold_high}개월을 초과합니다.
+                                총 {count}개 약품의 런웨이가 {threshold_high}개월을 초과합니다.
                             </p>
                         </div>
                         <p style="margin: 0 0 0 30px; color: var(--color-info); font-size: 0.875rem;">
@@ -3141,33 +3895,66 @@ def generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_
                             <tbody>
     """
 
-    for _, row in excess_drugs_df.iterrows():
-        drug_code = str(row['약품코드'])
-        is_checked = drug_code in checked_codes
 
-        # 런웨이 표시
-        runway_months = row['런웨이_개월']
-        runway_display = f"{runway_months:.2f}개월"
+def generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_high=12, sparkline_registry=None,
+                                  checked_codes=None, memos=None, custom_thresholds=None):
+    """과다 재고 약품 섹션 HTML 생성 (테이블 형식 + 체크박스/메모 + 인라인 차트) - 모달용
 
-        # 스파크라인 생성
-        timeseries = row['월별_조제수량_리스트']
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
+    런웨이가 threshold_high개월을 초과하는 약품들 (유효기간 만료 위험)
+    """
 
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
+    if excess_drugs_df.empty:
+        return ""
+
+    # 체크된 약품 코드/메모/개별 임계값 (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_codes is None:
+        checked_codes = checked_items_db.get_checked_items()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+    if custom_thresholds is None:
+        custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    excess_drugs_df = ensure_ma_list_column(excess_drugs_df, ma_months)
+
+    parts = [_EXCESS_STOCK_HEADER_TEMPLATE.format(
+        count=len(excess_drugs_df), threshold_high=threshold_high, ma_months=ma_months,
+    )]
+
+    # 표시용 약품명(30자)/제약회사(12자) 일괄 자르기
+    excess_drugs_df = excess_drugs_df.assign(**{
+        '_약품명_표시': truncate_display_series(excess_drugs_df['약품명'], 30),
+        '_제약회사_표시': truncate_display_series(excess_drugs_df['제약회사'], 12),
+    })
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        excess_drugs_df['약품코드'],
+        excess_drugs_df['약품코드'].astype(str).isin(checked_codes),
+        excess_drugs_df['런웨이_개월'],
+        excess_drugs_df['약품명'],
+        excess_drugs_df['_약품명_표시'],
+        excess_drugs_df['_제약회사_표시'],
+        excess_drugs_df.get('신규여부', repeat(False)),
+        excess_drugs_df.get('사용기간', repeat(0)),
+        excess_drugs_df['N개월_이동평균'],
+        excess_drugs_df['최종_재고수량'],
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(excess_drugs_df['월별_조제수량_리스트']), excess_drugs_df['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for (drug_code, is_checked, runway_months, drug_name, drug_name_display, company_display,
+         is_new_drug, usage_months_val, latest_ma, stock, sparkline_html) in rows:
+        drug_code = str(drug_code)
 
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
+        # 런웨이 표시
+        runway_display = f"{runway_months:.2f}개월"
 
         # 메모 가져오기
         memo = memos.get(drug_code, '')
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -3186,33 +3973,49 @@ def generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_
                 threshold_icon = f'<span class="threshold-indicator" data-tooltip="{tooltip_text}" onclick="event.stopPropagation(); showThresholdTooltip(event, this)"><svg class="icon-sm" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12.22 2h-.44a2 2 0 0 0-2 2v.18a2 2 0 0 1-1 1.73l-.43.25a2 2 0 0 1-2 0l-.15-.08a2 2 0 0 0-2.73.73l-.22.38a2 2 0 0 0 .73 2.73l.15.1a2 2 0 0 1 1 1.72v.51a2 2 0 0 1-1 1.74l-.15.09a2 2 0 0 0-.73 2.73l.22.38a2 2 0 0 0 2.73.73l.15-.08a2 2 0 0 1 2 0l.43.25a2 2 0 0 1 1 1.73V20a2 2 0 0 0 2 2h.44a2 2 0 0 0 2-2v-.18a2 2 0 0 1 1-1.73l.43-.25a2 2 0 0 1 2 0l.15.08a2 2 0 0 0 2.73-.73l.22-.39a2 2 0 0 0-.73-2.73l-.15-.08a2 2 0 0 1-1-1.74v-.5a2 2 0 0 1 1-1.74l.15-.09a2 2 0 0 0 .73-2.73l-.22-.38a2 2 0 0 0-2.73-.73l-.15.08a2 2 0 0 1-2 0l-.43-.25a2 2 0 0 1-1-1.73V4a2 2 0 0 0-2-2z"/><circle cx="12" cy="12" r="3"/></svg></span>'
 
         # 숨김 버튼 상태
-        hidden_class = "hidden" if is_checked else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_checked else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_checked else "휴지통에 넣기"
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_checked]
 
         # 신규 약품 태그 (데이터에 포함된 경우)
         new_drug_tag = ""
-        if row.get('신규여부', False) and row.get('사용기간', 0) > 0:
-            usage_months_val = row['사용기간']
+        if is_new_drug and usage_months_val > 0:
             new_drug_tag = f'<span class="new-drug-tag">신규<span class="help-icon" onclick="event.stopPropagation(); openNewDrugInfoModal(\'{drug_code}\', {usage_months_val}, {ma_months})">?</span></span>'
 
         # 인라인 차트용 데이터 생성
-        latest_ma = row['N개월_이동평균']
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': int(row['최종_재고수량']),
-            'latest_ma': latest_ma,
-            'runway': runway_display
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=int(stock),
+            latest_ma=latest_ma,
+            runway=runway_display,
+        )
+
+        parts.append(_RUNWAY_ROW_TEMPLATE.format(
+            row_class="excess-row",
+            runway_color="#2563eb",
+            drug_code=drug_code,
+            chart_data_json=chart_data_json,
+            hidden_class=hidden_class,
+            hidden_title=hidden_title,
+            hidden_icon=hidden_icon,
+            memo_btn_class=memo_btn_class,
+            memo_title=memo_button_title(memo),
+            threshold_icon=threshold_icon,
+            drug_name_display=drug_name_display,
+            company_display=company_display,
+            stock=stock,
+            latest_ma=latest_ma,
+            new_drug_tag=new_drug_tag,
+            runway_display=runway_display,
+            sparkline_html=sparkline_html,
+        ))
+
+    parts.append(_SECTION_TABLE_CLOSE)
+
+    return "".join(parts)
+
 
-        html += f"""
-                                <tr class="excess-row tab-clickable-row" data-drug-code="{drug_code}"
+# 악성 재고 테이블 행 템플릿 (행마다 f-string을 다시 조립하지 않도록 한 번만 정의)
+_DEAD_STOCK_ROW_TEMPLATE = """
+                                <tr class="dead-row tab-clickable-row" data-drug-code="{drug_code}" style="background: rgba(247, 250, 252, 0.7);"
                                     data-chart-data='{chart_data_json}'
                                     onclick="toggleInlineChart(this, '{drug_code}')">
                                     <td style="text-align: center;" onclick="event.stopPropagation()">
@@ -3223,7 +4026,7 @@ def generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_
                                             <button class="memo-btn {memo_btn_class}"
                                                     data-drug-code="{drug_code}"
                                                     onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
+                                                    title="{memo_title}">
                                                 ✎
                                             </button>
                                         </div>
@@ -3231,51 +4034,22 @@ def generate_excess_stock_section(excess_drugs_df, ma_months, months, threshold_
                                     <td style="font-weight: bold;">{threshold_icon}{drug_name_display}</td>
                                     <td>{drug_code}</td>
                                     <td>{company_display}</td>
-                                    <td>{row['최종_재고수량']:,.0f}</td>
-                                    <td>{row['N개월_이동평균']:.2f}{new_drug_tag}</td>
-                                    <td style="color: #2563eb; font-weight: bold;">{runway_display}</td>
+                                    <td style="color: #2d5016; font-weight: bold;">{stock:,.0f}</td>
+                                    <td style="color: #c53030;">0</td>
+                                    <td style="color: #a0aec0; font-style: italic;">재고만 있음</td>
                                     <td>{sparkline_html}</td>
                                 </tr>
         """
 
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-    """
-
-    # 메모 데이터를 JSON으로 변환
-    memos_json = json.dumps(memos, ensure_ascii=False)
-
-    html += f"""
-            <script>
-                // 과다 탭 메모 데이터
-                var excessDrugMemos = {memos_json};
-            </script>
-    """
-
-    return html
-
-
-def generate_dead_stock_section(dead_stock_drugs, ma_months, months):
-    """악성 재고 섹션 HTML 생성 (테이블 형식 + 체크박스/메모/스파크라인 + 인라인 차트) - 모달용"""
-    import json
-
-    total_dead_stock = dead_stock_drugs['최종_재고수량'].sum()
-
-    # DB에서 체크된 약품 코드 목록 가져오기 (카테고리 없이)
-    checked_codes = checked_items_db.get_checked_items()
-    memos = drug_memos_db.get_all_memos()
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
-
-    html = f"""
+# 악성 재고 섹션 안내 문구 + 테이블 헤더 템플릿
+_DEAD_STOCK_HEADER_TEMPLATE = """
                     <div style="padding: var(--space-4); background: var(--bg-subtle); border-radius: var(--radius-lg); margin-bottom: var(--space-4);">
                         <div style="display: flex; align-items: center; gap: var(--space-3); margin-bottom: var(--space-2);">
                             <svg class="icon" style="color: var(--text-secondary); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                 <path d="M21 16V8a2 2 0 0 0-1-1.73l-7-4a2 2 0 0 0-2 0l-7 4A2 2 0 0 0 3 8v8a2 2 0 0 0 1 1.73l7 4a2 2 0 0 0 2 0l7-4A2 2 0 0 0 21 16z"/><polyline points="3.29 7 12 12 20.71 7"/><line x1="12" x2="12" y1="22" y2="12"/>
                             </svg>
                             <p style="margin: 0; color: var(--text-secondary); font-weight: 600;">
-                                총 {len(dead_stock_drugs)}개 약품이 {ma_months}개월 동안 사용되지 않았으나 재고가 {total_dead_stock:,.0f}개 남아있습니다.
+                                총 {count}개 약품이 {ma_months}개월 동안 사용되지 않았으나 재고가 {total_dead_stock:,.0f}개 남아있습니다.
                             </p>
                         </div>
                         <p style="margin: 0 0 0 30px; color: var(--text-muted); font-size: 0.875rem;">
@@ -3299,32 +4073,56 @@ def generate_dead_stock_section(dead_stock_drugs, ma_months, months):
                             <tbody>
     """
 
-    for _, row in dead_stock_drugs.iterrows():
-        drug_code = str(row['약품코드'])
-        is_checked = drug_code in checked_codes
-
-        # N개월 이동평균
-        latest_ma = row['N개월_이동평균']
-
-        # 스파크라인 생성
-        timeseries = row['월별_조제수량_리스트']
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
 
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
+def generate_dead_stock_section(dead_stock_drugs, ma_months, months, sparkline_registry=None,
+                                checked_codes=None, memos=None, custom_thresholds=None):
+    """악성 재고 섹션 HTML 생성 (테이블 형식 + 체크박스/메모/스파크라인 + 인라인 차트) - 모달용"""
 
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
+    # 재고수량 배열을 한 번만 꺼내 합계와 행 루프에 함께 사용
+    stock_arr = dead_stock_drugs['최종_재고수량'].to_numpy()
+    total_dead_stock = stock_arr.sum()
+
+    # 체크된 약품 코드/메모/개별 임계값 (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_codes is None:
+        checked_codes = checked_items_db.get_checked_items()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+    if custom_thresholds is None:
+        custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    dead_stock_drugs = ensure_ma_list_column(dead_stock_drugs, ma_months)
+
+    parts = [_DEAD_STOCK_HEADER_TEMPLATE.format(
+        count=len(dead_stock_drugs), ma_months=ma_months, total_dead_stock=total_dead_stock,
+    )]
+
+    # 표시용 약품명(30자)/제약회사(12자) 일괄 자르기
+    dead_stock_drugs = dead_stock_drugs.assign(**{
+        '_약품명_표시': truncate_display_series(dead_stock_drugs['약품명'], 30),
+        '_제약회사_표시': truncate_display_series(dead_stock_drugs['제약회사'], 12),
+    })
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        dead_stock_drugs['약품코드'],
+        dead_stock_drugs['약품코드'].astype(str).isin(checked_codes),
+        dead_stock_drugs['약품명'],
+        dead_stock_drugs['_약품명_표시'],
+        dead_stock_drugs['_제약회사_표시'],
+        stock_arr.tolist(),
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(dead_stock_drugs['월별_조제수량_리스트']), dead_stock_drugs['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for drug_code, is_checked, drug_name, drug_name_display, company_display, stock, sparkline_html in rows:
+        drug_code = str(drug_code)
 
         # 메모 가져오기
         memo = memos.get(drug_code, '')
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -3343,88 +4141,45 @@ def generate_dead_stock_section(dead_stock_drugs, ma_months, months):
                 threshold_icon = f'<span class="threshold-indicator" data-tooltip="{tooltip_text}" onclick="event.stopPropagation(); showThresholdTooltip(event, this)"><svg class="icon-sm" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12.22 2h-.44a2 2 0 0 0-2 2v.18a2 2 0 0 1-1 1.73l-.43.25a2 2 0 0 1-2 0l-.15-.08a2 2 0 0 0-2.73.73l-.22.38a2 2 0 0 0 .73 2.73l.15.1a2 2 0 0 1 1 1.72v.51a2 2 0 0 1-1 1.74l-.15.09a2 2 0 0 0-.73 2.73l.22.38a2 2 0 0 0 2.73.73l.15-.08a2 2 0 0 1 2 0l.43.25a2 2 0 0 1 1 1.73V20a2 2 0 0 0 2 2h.44a2 2 0 0 0 2-2v-.18a2 2 0 0 1 1-1.73l.43-.25a2 2 0 0 1 2 0l.15.08a2 2 0 0 0 2.73-.73l.22-.39a2 2 0 0 0-.73-2.73l-.15-.08a2 2 0 0 1-1-1.74v-.5a2 2 0 0 1 1-1.74l.15-.09a2 2 0 0 0 .73-2.73l-.22-.38a2 2 0 0 0-2.73-.73l-.15.08a2 2 0 0 1-2 0l-.43-.25a2 2 0 0 1-1-1.73V4a2 2 0 0 0-2-2z"/><circle cx="12" cy="12" r="3"/></svg></span>'
 
         # 숨김 버튼 상태
-        hidden_class = "hidden" if is_checked else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_checked else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_checked else "휴지통에 넣기"
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_checked]
 
         # 인라인 차트용 데이터 생성
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': int(row['최종_재고수량']),
-            'latest_ma': 0,
-            'runway': '재고만 있음'
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
-
-        html += f"""
-                                <tr class="dead-row tab-clickable-row" data-drug-code="{drug_code}" style="background: rgba(247, 250, 252, 0.7);"
-                                    data-chart-data='{chart_data_json}'
-                                    onclick="toggleInlineChart(this, '{drug_code}')">
-                                    <td style="text-align: center;" onclick="event.stopPropagation()">
-                                        <div class="checkbox-memo-container">
-                                            <button class="visibility-btn {hidden_class}" data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); toggleVisibility(this, '{drug_code}')"
-                                                    title="{hidden_title}">{hidden_icon}</button>
-                                            <button class="memo-btn {memo_btn_class}"
-                                                    data-drug-code="{drug_code}"
-                                                    onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
-                                                ✎
-                                            </button>
-                                        </div>
-                                    </td>
-                                    <td style="font-weight: bold;">{threshold_icon}{drug_name_display}</td>
-                                    <td>{drug_code}</td>
-                                    <td>{company_display}</td>
-                                    <td style="color: #2d5016; font-weight: bold;">{row['최종_재고수량']:,.0f}</td>
-                                    <td style="color: #c53030;">0</td>
-                                    <td style="color: #a0aec0; font-style: italic;">재고만 있음</td>
-                                    <td>{sparkline_html}</td>
-                                </tr>
-        """
-
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-    """
-
-    # 메모 데이터를 JSON으로 변환
-    memos_json = json.dumps(memos, ensure_ascii=False)
-
-    html += f"""
-            <script>
-                // 악성재고 탭 메모 데이터
-                var deadDrugMemos = {memos_json};
-            </script>
-    """
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=int(stock),
+            latest_ma=0,
+            runway='재고만 있음',
+        )
+
+        parts.append(_DEAD_STOCK_ROW_TEMPLATE.format(
+            drug_code=drug_code,
+            chart_data_json=chart_data_json,
+            hidden_class=hidden_class,
+            hidden_title=hidden_title,
+            hidden_icon=hidden_icon,
+            memo_btn_class=memo_btn_class,
+            memo_title=memo_button_title(memo),
+            threshold_icon=threshold_icon,
+            drug_name_display=drug_name_display,
+            company_display=company_display,
+            stock=stock,
+            sparkline_html=sparkline_html,
+        ))
 
-    return html
+    parts.append(_SECTION_TABLE_CLOSE)
 
+    return "".join(parts)
 
-def generate_negative_stock_section(negative_stock_drugs, ma_months, months):
-    """음수 재고 섹션 HTML 생성 (테이블 형식 + 스파크라인 + 인라인 차트) - 모달용"""
-    import json
 
-    total_negative_stock = negative_stock_drugs['최종_재고수량'].sum()
-
-    # DB에서 체크된 약품 코드 목록 가져오기
-    checked_codes = checked_items_db.get_checked_items()
-    memos = drug_memos_db.get_all_memos()
-
-    html = f"""
+# 음수 재고 섹션 안내 문구 + 테이블 헤더 템플릿
+_NEGATIVE_STOCK_HEADER_TEMPLATE = """
                     <div style="padding: var(--space-4); background: var(--color-danger-light); border-radius: var(--radius-lg); margin-bottom: var(--space-4);">
                         <div style="display: flex; align-items: center; gap: var(--space-3); margin-bottom: var(--space-2);">
                             <svg class="icon" style="color: var(--color-danger); flex-shrink: 0;" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                 <path d="m21.73 18-8-14a2 2 0 0 0-3.48 0l-8 14A2 2 0 0 0 4 21h16a2 2 0 0 0 1.73-3Z"/><line x1="12" x2="12" y1="9" y2="13"/><line x1="12" x2="12.01" y1="17" y2="17"/>
                             </svg>
                             <p style="margin: 0; color: var(--color-danger-dark); font-weight: 600;">
-                                총 {len(negative_stock_drugs)}개 약품의 재고가 음수입니다. (총 {total_negative_stock:,.0f}개)
+                                총 {count}개 약품의 재고가 음수입니다. (총 {total_negative_stock:,.0f}개)
                             </p>
                         </div>
                         <p style="margin: 0 0 0 30px; color: var(--color-danger); font-size: 0.875rem;">
@@ -3448,57 +4203,71 @@ def generate_negative_stock_section(negative_stock_drugs, ma_months, months):
                             <tbody>
     """
 
-    for _, row in negative_stock_drugs.iterrows():
-        drug_code = str(row['약품코드'])
-        is_checked = drug_code in checked_codes
 
-        # N개월 이동평균
-        latest_ma = row['N개월_이동평균']
-
-        # 스파크라인 생성
-        timeseries = row['월별_조제수량_리스트']
-        ma = calculate_custom_ma(timeseries, ma_months)
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
+def generate_negative_stock_section(negative_stock_drugs, ma_months, months, sparkline_registry=None,
+                                    checked_codes=None, memos=None):
+    """음수 재고 섹션 HTML 생성 (테이블 형식 + 스파크라인 + 인라인 차트) - 모달용"""
 
-        # 약품명 30자 제한
-        drug_name_display = row['약품명'] if row['약품명'] is not None else "정보없음"
-        if len(drug_name_display) > 30:
-            drug_name_display = drug_name_display[:30] + "..."
+    total_negative_stock = negative_stock_drugs['최종_재고수량'].sum()
 
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
+    # 체크된 약품 코드/메모 (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_codes is None:
+        checked_codes = checked_items_db.get_checked_items()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    negative_stock_drugs = ensure_ma_list_column(negative_stock_drugs, ma_months)
+
+    parts = [_NEGATIVE_STOCK_HEADER_TEMPLATE.format(
+        count=len(negative_stock_drugs), total_negative_stock=total_negative_stock, ma_months=ma_months,
+    )]
+
+    # 표시용 약품명(30자)/제약회사(12자) 일괄 자르기
+    negative_stock_drugs = negative_stock_drugs.assign(**{
+        '_약품명_표시': truncate_display_series(negative_stock_drugs['약품명'], 30),
+        '_제약회사_표시': truncate_display_series(negative_stock_drugs['제약회사'], 12),
+    })
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        negative_stock_drugs['약품코드'],
+        negative_stock_drugs['약품코드'].astype(str).isin(checked_codes),
+        negative_stock_drugs['N개월_이동평균'],
+        negative_stock_drugs['약품명'],
+        negative_stock_drugs['_약품명_표시'],
+        negative_stock_drugs['_제약회사_표시'],
+        negative_stock_drugs['최종_재고수량'],
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(negative_stock_drugs['월별_조제수량_리스트']), negative_stock_drugs['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for (drug_code, is_checked, latest_ma, drug_name, drug_name_display, company_display, stock,
+         sparkline_html) in rows:
+        drug_code = str(drug_code)
 
         # 메모 가져오기
         memo = memos.get(drug_code, '')
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
 
         # 숨김 버튼 상태
-        hidden_class = "hidden" if is_checked else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_checked else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_checked else "휴지통에 넣기"
+        hidden_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_checked]
 
         # 비고 (사용 중인지 여부)
         usage_note = "사용 중" if latest_ma > 0 else "미사용"
         usage_color = "#059669" if latest_ma > 0 else "#6b7280"
 
         # 인라인 차트용 데이터 생성
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': int(row['최종_재고수량']),
-            'latest_ma': float(latest_ma) if latest_ma else 0,
-            'runway': '음수 재고'
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
-
-        html += f"""
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=int(stock),
+            latest_ma=float(latest_ma) if latest_ma else 0,
+            runway='음수 재고',
+        )
+
+        parts.append(f"""
                                 <tr class="negative-row tab-clickable-row" data-drug-code="{drug_code}" style="background: rgba(254, 242, 242, 0.7);"
                                     data-chart-data='{chart_data_json}'
                                     onclick="toggleInlineChart(this, '{drug_code}')">
@@ -3510,7 +4279,7 @@ def generate_negative_stock_section(negative_stock_drugs, ma_months, months):
                                             <button class="memo-btn {memo_btn_class}"
                                                     data-drug-code="{drug_code}"
                                                     onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
+                                                    title="{memo_button_title(memo)}">
                                                 ✎
                                             </button>
                                         </div>
@@ -3518,45 +4287,20 @@ def generate_negative_stock_section(negative_stock_drugs, ma_months, months):
                                     <td style="font-weight: bold;">{drug_name_display}</td>
                                     <td>{drug_code}</td>
                                     <td>{company_display}</td>
-                                    <td style="color: #dc2626; font-weight: bold;">{row['최종_재고수량']:,.0f}</td>
+                                    <td style="color: #dc2626; font-weight: bold;">{stock:,.0f}</td>
                                     <td>{latest_ma:.2f}</td>
                                     <td style="color: {usage_color}; font-weight: 500;">{usage_note}</td>
                                     <td>{sparkline_html}</td>
                                 </tr>
-        """
-
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-    """
+        """)
 
-    # 메모 데이터를 JSON으로 변환
-    memos_json = json.dumps(memos, ensure_ascii=False)
-
-    html += f"""
-            <script>
-                // 음수재고 탭 메모 데이터
-                var negativeDrugMemos = {memos_json};
-            </script>
-    """
+    parts.append(_SECTION_TABLE_CLOSE)
 
-    return html
+    return "".join(parts)
 
 
-def generate_hidden_drugs_section(df, ma_months, months):
-    """숨김 처리된 약품 섹션 HTML 생성 - 모달용
-
-    모든 약품을 포함하고, JavaScript로 숨김 상태에 따라 표시/숨김 처리
-    """
-
-    # 체크된 항목(숨김 처리된 항목) 가져오기
-    checked_items = checked_items_db.get_checked_items()
-    checked_items_status = checked_items_db.get_checked_items_with_status()
-    memos = drug_memos_db.get_all_memos()
-    custom_thresholds = drug_thresholds_db.get_threshold_dict()
-
-    html = f"""
+# 숨김 약품 섹션 안내 문구 + 테이블 헤더 템플릿
+_HIDDEN_DRUGS_HEADER_TEMPLATE = """
                     <div id="hidden-empty-message" style="padding: var(--space-8); text-align: center; color: var(--text-muted); display: none;">
                         <svg class="icon-xl" style="width: 48px; height: 48px; margin: 0 auto var(--space-4);" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="1.5">
                             <path d="M3 6h18"/><path d="M19 6v14c0 1-1 2-2 2H7c-1 0-2-1-2-2V6"/><path d="M8 6V4c0-1 1-2 2-2h4c1 0 2 1 2 2v2"/>
@@ -3582,49 +4326,71 @@ def generate_hidden_drugs_section(df, ma_months, months):
                             <tbody>
     """
 
+
+def generate_hidden_drugs_section(df, ma_months, months, sparkline_registry=None,
+                                  checked_items=None, checked_items_status=None, memos=None, custom_thresholds=None):
+    """숨김 처리된 약품 섹션 HTML 생성 - 모달용
+
+    모든 약품을 포함하고, JavaScript로 숨김 상태에 따라 표시/숨김 처리
+    """
+
+    # 체크된 항목(숨김 처리된 항목)/처리 상태/메모/개별 임계값
+    # (보고서에서 한 번 읽어 넘겨받고, 직접 호출된 경우에만 DB 조회)
+    if checked_items is None:
+        checked_items = checked_items_db.get_checked_items()
+    if checked_items_status is None:
+        checked_items_status = checked_items_db.get_checked_items_with_status()
+    if memos is None:
+        memos = drug_memos_db.get_all_memos()
+    if custom_thresholds is None:
+        custom_thresholds = drug_thresholds_db.get_threshold_dict()
+
+    # 스파크라인용 이동평균 리스트가 없으면 (직접 호출된 경우) 여기서 계산
+    df = ensure_ma_list_column(df, ma_months)
+
+    parts = [_HIDDEN_DRUGS_HEADER_TEMPLATE.format(ma_months=ma_months)]
+
+    # N개월 이동평균 최신값 (이동평균 리스트는 앞부분만 None이므로 마지막 원소가 곧 마지막 유효값, 없으면 0)
+    latest_ma_values = [ma[-1] if ma and ma[-1] else 0 for ma in df['_이동평균_리스트']]
+
     # 모든 약품을 포함 (숨김 처리 안된 것은 display:none으로 숨김)
-    for _, row in df.iterrows():
-        drug_code = str(row['약품코드'])
+    # 표시용 약품명(30자, 빈 문자열 포함)/제약회사(12자) 일괄 자르기
+    df = df.assign(**{
+        '_약품명_표시': truncate_display_series(df['약품명'].mask(df['약품명'] == ''), 30),
+        '_제약회사_표시': truncate_display_series(df['제약회사'], 12),
+    })
+
+    # iterrows 대신 필요한 컬럼만 zip으로 순회
+    rows = zip(
+        df['약품코드'],
+        df['약품코드'].astype(str).isin(checked_items),
+        df['약품명'],
+        df['_약품명_표시'],
+        df['_제약회사_표시'],
+        df['최종_재고수량'],
+        latest_ma_values,
+        # 스파크라인은 루프 전에 일괄 생성
+        create_sparkline_svgs(
+            stack_timeseries(df['월별_조제수량_리스트']), df['_이동평균_리스트'].tolist(),
+            ma_months, sparkline_registry,
+        ),
+    )
+    for (drug_code, is_hidden, drug_name, drug_name_display, company_display, stock, latest_ma,
+         sparkline_html) in rows:
+        drug_code = str(drug_code)
 
         # 숨김 상태 확인
-        is_hidden = drug_code in checked_items
         row_display_style = "" if is_hidden else "display: none;"
-        hidden_btn_class = "hidden" if is_hidden else ""
-        hidden_icon = '<i class="bi bi-arrow-counterclockwise"></i>' if is_hidden else '<i class="bi bi-trash"></i>'
-        hidden_title = "복원하기" if is_hidden else "휴지통에 넣기"
+        hidden_btn_class, hidden_icon, hidden_title = _TRASH_BUTTON_STATES[is_hidden]
 
         # 처리 상태
         process_status = checked_items_status.get(drug_code, '대기중')
 
-        # 약품명 30자 제한
-        drug_name = row['약품명'] if row['약품명'] else "정보없음"
-        drug_name_display = drug_name[:30] + "..." if len(drug_name) > 30 else drug_name
-
-        # 제약회사 12자 제한
-        company_display = row['제약회사'] if row['제약회사'] is not None else "정보없음"
-        if len(company_display) > 12:
-            company_display = company_display[:12] + "..."
-
         # 메모 가져오기
         memo = memos.get(drug_code, '')
         memo_btn_class = "has-memo" if memo else ""
-        memo_preview = memo[:50] + '...' if len(memo) > 50 else memo
-
-        # N개월 이동평균 계산
-        timeseries = row['월별_조제수량_리스트']
-        ma = calculate_custom_ma(timeseries, ma_months)
-        latest_ma = None
-        for val in reversed(ma):
-            if val is not None:
-                latest_ma = val
-                break
-        latest_ma = latest_ma if latest_ma else 0
-
-        # 스파크라인 생성
-        sparkline_html = create_sparkline_svg(timeseries, ma, ma_months)
 
         # 런웨이 계산
-        stock = row['최종_재고수량']
         if latest_ma > 0:
             runway_months = stock / latest_ma
             if runway_months < 1:
@@ -3636,18 +4402,12 @@ def generate_hidden_drugs_section(df, ma_months, months):
             runway_display = "N/A"
 
         # 인라인 차트용 데이터 생성
-        chart_data = {
-            'drug_name': row['약품명'] if row['약품명'] else "정보없음",
-            'drug_code': drug_code,
-            'timeseries': list(timeseries),
-            'ma': list(ma),
-            'months': months,
-            'ma_months': ma_months,
-            'stock': int(stock),
-            'latest_ma': latest_ma,
-            'runway': runway_display
-        }
-        chart_data_json = html_escape(json.dumps(chart_data, ensure_ascii=False))
+        chart_data_json = create_section_chart_data_json(
+            drug_name, drug_code, ma_months,
+            stock=int(stock),
+            latest_ma=latest_ma,
+            runway=runway_display,
+        )
 
         # 개별 임계값 아이콘 (설정된 경우에만)
         threshold_icon = ""
@@ -3665,7 +4425,7 @@ def generate_hidden_drugs_section(df, ma_months, months):
                 tooltip_text = '<br>'.join(tooltip_parts)
                 threshold_icon = f'<span class="threshold-indicator" data-tooltip="{tooltip_text}" onclick="event.stopPropagation(); showThresholdTooltip(event, this)"><svg class="icon-sm" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12.22 2h-.44a2 2 0 0 0-2 2v.18a2 2 0 0 1-1 1.73l-.43.25a2 2 0 0 1-2 0l-.15-.08a2 2 0 0 0-2.73.73l-.22.38a2 2 0 0 0 .73 2.73l.15.1a2 2 0 0 1 1 1.72v.51a2 2 0 0 1-1 1.74l-.15.09a2 2 0 0 0-.73 2.73l.22.38a2 2 0 0 0 2.73.73l.15-.08a2 2 0 0 1 2 0l.43.25a2 2 0 0 1 1 1.73V20a2 2 0 0 0 2 2h.44a2 2 0 0 0 2-2v-.18a2 2 0 0 1 1-1.73l.43-.25a2 2 0 0 1 2 0l.15.08a2 2 0 0 0 2.73-.73l.22-.39a2 2 0 0 0-.73-2.73l-.15-.08a2 2 0 0 1-1-1.74v-.5a2 2 0 0 1 1-1.74l.15-.09a2 2 0 0 0 .73-2.73l-.22-.38a2 2 0 0 0-2.73-.73l-.15.08a2 2 0 0 1-2 0l-.43-.25a2 2 0 0 1-1-1.73V4a2 2 0 0 0-2-2z"/><circle cx="12" cy="12" r="3"/></svg></span>'
 
-        html += f"""
+        parts.append(f"""
                                 <tr class="hidden-row-item tab-clickable-row" data-drug-code="{drug_code}"
                                     data-chart-data='{chart_data_json}' style="{row_display_style}"
                                     onclick="toggleInlineChart(this, '{drug_code}')">
@@ -3677,7 +4437,7 @@ def generate_hidden_drugs_section(df, ma_months, months):
                                             <button class="memo-btn {memo_btn_class}"
                                                     data-drug-code="{drug_code}"
                                                     onclick="event.stopPropagation(); openMemoModalGeneric('{drug_code}')"
-                                                    title="{memo_preview if memo else '메모 추가'}">
+                                                    title="{memo_button_title(memo)}">
                                                 ✎
                                             </button>
                                         </div>
@@ -3691,15 +4451,11 @@ def generate_hidden_drugs_section(df, ma_months, months):
                                     <td>{runway_display}</td>
                                     <td>{sparkline_html}</td>
                                 </tr>
-        """
+        """)
 
-    html += """
-                            </tbody>
-                        </table>
-                    </div>
-    """
+    parts.append(_SECTION_TABLE_CLOSE)
 
-    return html
+    return "".join(parts)
 
 
 def analyze_runway(df, months, ma_months, threshold_low=3, threshold_high=12):
@@ -3717,63 +4473,37 @@ def analyze_runway(df, months, ma_months, threshold_low=3, threshold_high=12):
                - 앞 3개 값(chart_js)은 더 이상 사용되지 않음 (하위 호환성을 위해 유지)
     """
     try:
-        # N-MA 런웨이를 숫자로 변환 (개월 단위)
-        low_data = []  # threshold_low 이하 (차트용) - 부족
-        high_data = []  # threshold_low 초과 ~ threshold_high 이하 (차트용) - 충분
-        excess_data = []  # threshold_high 초과 (차트용) - 과다
-        low_drugs_list = []  # threshold_low 이하 (테이블용) - 부족
-        high_drugs_list = []  # threshold_low 초과 ~ threshold_high 이하 (테이블용) - 충분
-        excess_drugs_list = []  # threshold_high 초과 (테이블용) - 과다
-
-        for idx, row in df.iterrows():
-            # N개월 이동평균 계산 (보정 버전)
-            timeseries = row['월별_조제수량_리스트']
-            latest_ma, usage_months, is_corrected = get_corrected_ma(timeseries, ma_months)
-
-            # N-MA 런웨이 계산
-            ma_runway_months = None
-            if latest_ma and latest_ma > 0:
-                ma_runway_months = row['최종_재고수량'] / latest_ma
-
-            if ma_runway_months and ma_runway_months > 0:
-                # 데이터 구조: (N-MA런웨이(개월), 약품명, N개월평균)
-                data_tuple = (
-                    ma_runway_months,
-                    row['약품명'],
-                    latest_ma
-                )
-
-                # 테이블용 데이터 (전체 row 정보 + 계산된 값 + 신규 정보)
-                drug_data = {
-                    '약품코드': row['약품코드'],
-                    '약품명': row['약품명'],
-                    '제약회사': row['제약회사'],
-                    '최종_재고수량': row['최종_재고수량'],
-                    'N개월_이동평균': latest_ma,
-                    '런웨이_개월': ma_runway_months,
-                    '월별_조제수량_리스트': timeseries,
-                    '사용기간': usage_months,
-                    '신규여부': is_corrected
-                }
-
-                if ma_runway_months <= threshold_low:
-                    # 부족: 런웨이 threshold_low 이하
-                    low_data.append(data_tuple)
-                    low_drugs_list.append(drug_data)
-                elif ma_runway_months <= threshold_high:
-                    # 충분: 런웨이 threshold_low 초과 ~ threshold_high 이하
-                    high_data.append(data_tuple)
-                    high_drugs_list.append(drug_data)
-                else:
-                    # 과다: 런웨이 threshold_high 초과
-                    excess_data.append(data_tuple)
-                    excess_drugs_list.append(drug_data)
-
-        # DataFrame 생성
-        import pandas as pd
-        low_drugs_df = pd.DataFrame(low_drugs_list) if low_drugs_list else pd.DataFrame()
-        high_drugs_df = pd.DataFrame(high_drugs_list) if high_drugs_list else pd.DataFrame()
-        excess_drugs_df = pd.DataFrame(excess_drugs_list) if excess_drugs_list else pd.DataFrame()
+        # 전체 약품의 보정 N개월 이동평균과 N-MA 런웨이를 한 번에 계산
+        latest_ma, usage_months, is_corrected = get_corrected_ma_columns(df, ma_months)
+        stock = df['최종_재고수량'].to_numpy(dtype=float)
+
+        ma_runway_months = np.full(len(df), np.nan)
+        np.divide(stock, latest_ma, out=ma_runway_months, where=latest_ma > 0)
+
+        # 런웨이가 양수인 약품만 분류 (NaN은 비교 결과가 False)
+        has_runway = ma_runway_months > 0
+        low_mask = has_runway & (ma_runway_months <= threshold_low)  # 부족: 런웨이 threshold_low 이하
+        high_mask = has_runway & (ma_runway_months > threshold_low) & (ma_runway_months <= threshold_high)  # 충분
+        excess_mask = has_runway & (ma_runway_months > threshold_high)  # 과다: 런웨이 threshold_high 초과
+
+        # 테이블용 데이터 (기본 정보 + 계산된 값 + 신규 정보)
+        def build_drugs_df(mask):
+            if not mask.any():
+                return pd.DataFrame()
+            columns = ['약품코드', '약품명', '제약회사', '최종_재고수량']
+            if '_이동평균_리스트' in df.columns:
+                columns.append('_이동평균_리스트')
+            return df.loc[mask, columns].assign(**{
+                'N개월_이동평균': latest_ma[mask],
+                '런웨이_개월': ma_runway_months[mask],
+                '월별_조제수량_리스트': df['월별_조제수량_리스트'][mask],
+                '사용기간': usage_months[mask],
+                '신규여부': is_corrected[mask],
+            }).reset_index(drop=True)
+
+        low_drugs_df = build_drugs_df(low_mask)
+        high_drugs_df = build_drugs_df(high_mask)
+        excess_drugs_df = build_drugs_df(excess_mask)
 
         # 정렬: 부족/충분은 런웨이 오름차순, 과다는 런웨이 내림차순
         if not low_drugs_df.empty:
@@ -3786,9 +4516,9 @@ def analyze_runway(df, months, ma_months, threshold_low=3, threshold_high=12):
         chart_js_low = None
         chart_js_high = None
         chart_js_excess = None
-        low_count = len(low_data)
-        high_count = len(high_data)
-        excess_count = len(excess_data)
+        low_count = len(low_drugs_df)
+        high_count = len(high_drugs_df)
+        excess_count = len(excess_drugs_df)
 
         return chart_js_low, chart_js_high, chart_js_excess, low_count, high_count, excess_count, low_drugs_df, high_drugs_df, excess_drugs_df
     except Exception as e:
@@ -3797,6 +4527,23 @@ def analyze_runway(df, months, ma_months, threshold_low=3, threshold_high=12):
         traceback.print_exc()
     return None, None, None, 0, 0, 0, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
+
+def write_gzip_sidecar(path, compresslevel=6):
+    """
+    보고서 옆에 gzip 압축본(<파일명>.gz) 기록
+
+    보고서는 인라인 JSON/스크립트 비중이 커서 압축률이 높으므로,
+    웹 서버가 gzip을 받는 브라우저에는 이 압축본을 그대로 전송한다.
+
+    Returns:
+        str: 압축본 경로
+    """
+    gz_path = path + '.gz'
+    with open(path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=compresslevel) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    return gz_path
+
+
 def create_and_save_report(df, months, mode='dispense', ma_months=3, threshold_low=3, threshold_high=12, open_browser=True):
     """보고서를 생성하고 파일로 저장하는 함수
 
@@ -3817,30 +4564,38 @@ def create_and_save_report(df, months, mode='dispense', ma_months=3, threshold_l
     if not inventory_db.db_exists():
         print("⚠️  recent_inventory.sqlite3 파일이 없습니다.")
         print("   기존 CSV의 재고수량을 사용합니다.")
-        df_final = df.copy()
+        # 이후 단계는 df를 수정하지 않으므로 복사하지 않고 그대로 사용
+        df_final = df
     else:
         print(f"✅ recent_inventory.sqlite3에서 최신 재고 데이터 로드 중...")
-        inventory_df = inventory_db.get_all_inventory_as_df()
+        inventory_df = inventory_db.get_inventory_stock_df()
 
         if inventory_df.empty:
             print("⚠️  DB에 재고 데이터가 없습니다. 기존 CSV의 재고수량을 사용합니다.")
-            df_final = df.copy()
+            df_final = df
         else:
             print(f"   {len(inventory_df)}개 약품의 재고 정보 로드 완료")
 
             # 2. 통계 데이터와 최신 재고 데이터 병합
-            df_final = df.copy()
-
-            # 약품코드를 str로 정규화
-            df_final['약품코드'] = df_final['약품코드'].astype(str)
-            inventory_df['약품코드'] = inventory_df['약품코드'].astype(str)
+            # 약품코드 컬럼만 바꾸면 되므로 얕은 복사로 원본 df와 나머지 컬럼 데이터를 공유
+            # (merge가 어차피 새 DataFrame을 만들기 때문에 깊은 복사는 불필요)
+            df_final = df.copy(deep=False)
+
+            # 약품코드를 str로 정규화한 뒤 양쪽이 같은 범주형 dtype을 쓰도록 변환
+            # (병합 시 문자열 해시 대신 정수 코드로 조인)
+            left_codes = df_final['약품코드'].astype(str)
+            right_codes = inventory_df['약품코드']
+            code_dtype = pd.CategoricalDtype(union_categoricals(
+                [left_codes.astype('category'), right_codes.astype('category')]
+            ).categories)
+            df_final['약품코드'] = left_codes.astype(code_dtype)
+            inventory_key_df = inventory_df.assign(약품코드=right_codes.astype(code_dtype))
 
             # 병합 (최종_재고수량을 현재_재고수량으로 업데이트)
-            df_final = df_final.merge(
-                inventory_df[['약품코드', '현재_재고수량', '최종_업데이트일시']],
-                on='약품코드',
-                how='left'
-            )
+            df_final = df_final.merge(inventory_key_df, on='약품코드', how='left')
+
+            # 이후 보고서 코드는 문자열 약품코드를 기대하므로 되돌림
+            df_final['약품코드'] = df_final['약품코드'].astype(str)
 
             # 최종_재고수량을 현재_재고수량으로 업데이트 (있는 경우)
             df_final['최종_재고수량'] = df_final['현재_재고수량'].fillna(df_final['최종_재고수량'])
@@ -3859,18 +4614,28 @@ def create_and_save_report(df, months, mode='dispense', ma_months=3, threshold_l
     output_dir = paths.get_reports_path('inventory')
     os.makedirs(output_dir, exist_ok=True)
 
-    # HTML 보고서 생성
-    print("\n📝 HTML 보고서 생성 중...")
-    html_content = generate_html_report(df_final, months, mode=mode, ma_months=ma_months,
-                                        threshold_low=threshold_low, threshold_high=threshold_high)
-
     # 파일명에 모드 및 MA 개월 수 반영
     mode_suffix = 'dispense' if mode == 'dispense' else 'sale'
     filename = f'simple_report_{mode_suffix}_{ma_months}ma_{datetime.now().strftime("%Y%m%d_%H%M%S")}.html'
     output_path = os.path.join(output_dir, filename)
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # HTML 보고서 생성 (조각 단위로 파일에 바로 기록)
+    print("\n📝 HTML 보고서 생성 중...")
+    try:
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            generate_html_report(df_final, months, mode=mode, ma_months=ma_months,
+                                 threshold_low=threshold_low, threshold_high=threshold_high, out=f)
+    except Exception:
+        # 생성 도중 실패하면 반쯤 기록된 파일을 남기지 않음
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    # 웹 서버 전송용 gzip 압축본 (실패해도 보고서 자체는 유효하므로 경고만 출력)
+    try:
+        write_gzip_sidecar(output_path)
+    except OSError as e:
+        print(f"⚠️  압축본 생성 실패: {e}")
 
     print(f"\n✅ 보고서가 생성되었습니다: {output_path}")
 
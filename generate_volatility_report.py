@@ -273,6 +273,8 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
         'cv': round(d['cv'], 3),
         'group': d['volatility_group']
     } for d in scatter_data], ensure_ascii=False)
+    # y축 상한은 서버에서 한 번 계산 (JS에서 Math.max(...배열) 전개 시 인자 수 한도 문제 방지)
+    scatter_max_cv = max((round(d['cv'], 3) for d in scatter_data), default=0) * 1.1
 
     # 메모 데이터 로드
     all_memos = drug_memos_db.get_all_memos()
@@ -285,7 +287,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{report_title}</title>
-    <script src="https://cdn.plot.ly/plotly-2.18.2.min.js"></script>
+    <script defer src="https://cdn.plot.ly/plotly-2.18.2.min.js"></script>
     <style>
         * {{
             margin: 0;
@@ -425,6 +427,9 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
             padding: 10px 8px;
             border-bottom: 1px solid #e2e8f0;
         }}
+        td > svg {{
+            display: block;
+        }}
         tr.clickable-row {{
             cursor: pointer;
             transition: background-color 0.2s;
@@ -1027,8 +1032,9 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
         const scatterData = {scatter_json};
         const thresholdHigh = {threshold_high};
         const thresholdMid = {threshold_mid};
+        const maxCV = {json.dumps(scatter_max_cv)};
 
-        // 산점도 생성
+        // 산점도 생성 (약품 수만큼 마커가 찍히므로 SVG 대신 WebGL(scattergl)로 렌더링)
         function createScatterPlot() {{
             const highGroup = scatterData.filter(d => d.group === 'high');
             const midGroup = scatterData.filter(d => d.group === 'mid');
@@ -1036,6 +1042,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
 
             const traces = [
                 {{
+                    type: 'scattergl',
                     x: highGroup.map(d => d.mean_usage),
                     y: highGroup.map(d => d.cv),
                     text: highGroup.map(d => d.drug_name),
@@ -1045,6 +1052,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
                     hovertemplate: '<b>%{{text}}</b><br>평균: %{{x:.1f}}<br>CV: %{{y:.2f}}<extra></extra>'
                 }},
                 {{
+                    type: 'scattergl',
                     x: midGroup.map(d => d.mean_usage),
                     y: midGroup.map(d => d.cv),
                     text: midGroup.map(d => d.drug_name),
@@ -1054,6 +1062,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
                     hovertemplate: '<b>%{{text}}</b><br>평균: %{{x:.1f}}<br>CV: %{{y:.2f}}<extra></extra>'
                 }},
                 {{
+                    type: 'scattergl',
                     x: lowGroup.map(d => d.mean_usage),
                     y: lowGroup.map(d => d.cv),
                     text: lowGroup.map(d => d.drug_name),
@@ -1064,8 +1073,6 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
                 }}
             ];
 
-            const maxCV = Math.max(...scatterData.map(d => d.cv)) * 1.1;
-
             const layout = {{
                 xaxis: {{
                     title: '평균 월 사용량',
@@ -1117,7 +1124,8 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
             Plotly.newPlot('scatter-chart', traces, layout, {{responsive: true}});
         }}
 
-        createScatterPlot();
+        // Plotly는 defer로 로드되므로 문서 파싱이 끝난 뒤(defer 스크립트 실행 후) 산점도 생성
+        document.addEventListener('DOMContentLoaded', createScatterPlot);
 
         // 테이블 검색
         function searchTable() {{
@@ -1149,6 +1157,31 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
             }}
         }}
 
+        // 인라인 차트 div는 종류별로 한 번만 만들고 새 차트 행으로 옮겨 Plotly.react로 갱신
+        // (열 때마다 newPlot으로 차트 DOM과 리스너를 다시 만들지 않음)
+        const inlineChartDivs = {{}};
+
+        function plotInlineChart(kind, drugCode, traces, layout) {{
+            const placeholder = document.getElementById(`${{kind}}-${{drugCode}}`);
+            if (!placeholder) return;
+
+            // Plotly(defer)가 아직 로드되지 않았으면 페이지 로드 후 다시 그림
+            if (typeof Plotly === 'undefined') {{
+                window.addEventListener('load', () => plotInlineChart(kind, drugCode, traces, layout), {{once: true}});
+                return;
+            }}
+
+            let container = inlineChartDivs[kind];
+            if (container) {{
+                container.id = placeholder.id;
+                placeholder.replaceWith(container);
+            }} else {{
+                container = inlineChartDivs[kind] = placeholder;
+            }}
+
+            Plotly.react(container, traces, layout, {{responsive: true}});
+        }}
+
         // 인라인 차트 토글
         function toggleInlineChart(row, drugCode) {{
             // 기존 차트 행 닫기
@@ -1247,7 +1280,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
                 hovermode: 'x unified'
             }};
 
-            Plotly.newPlot(`inline-chart-${{drugCode}}`, traces, layout, {{responsive: true}});
+            plotInlineChart('inline-chart', drugCode, traces, layout);
         }}
 
         // 메모 모달 열기
@@ -1418,7 +1451,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
                 hovermode: 'x unified'
             }};
 
-            Plotly.newPlot(`sporadic-inline-chart-${{drugCode}}`, traces, layout, {{responsive: true}});
+            plotInlineChart('sporadic-inline-chart', drugCode, traces, layout);
         }}
 
         // 신규 약품 모달 열기/닫기
@@ -1528,7 +1561,7 @@ def generate_html_report(df, months, mode='dispense', threshold_high=0.5, thresh
                 hovermode: 'x unified'
             }};
 
-            Plotly.newPlot(`new-drugs-inline-chart-${{drugCode}}`, traces, layout, {{responsive: true}});
+            plotInlineChart('new-drugs-inline-chart', drugCode, traces, layout);
         }}
 
         // 모달 외부 클릭 시 닫기
@@ -1586,9 +1619,9 @@ def create_and_save_report(df, months, mode='dispense', threshold_high=0.5, thre
     filename = f"volatility_report_{mode}_{timestamp}.html"
     filepath = os.path.join(report_dir, filename)
 
-    # 파일 저장
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # 파일 저장 (한 번에 인코딩해 바이너리로 기록, 텍스트 모드 인코더/줄바꿈 변환 생략)
+    with open(filepath, 'wb') as f:
+        f.write(html_content.encode('utf-8'))
 
     print(f"보고서 저장: {filepath}")
 
@@ -143,6 +143,30 @@ def get_all_inventory_as_df():
         return pd.DataFrame()
 
 
+def get_inventory_stock_df():
+    """
+    보고서 병합용 재고 DataFrame 반환 (약품코드, 현재_재고수량, 최종_업데이트일시만)
+
+    필요한 컬럼만 읽고 dtype을 지정해 object 컬럼 재변환을 피함
+
+    Returns:
+        pd.DataFrame: 재고 데이터프레임 (실패 시 빈 DataFrame)
+    """
+    try:
+        conn = get_connection()
+        df = pd.read_sql_query(
+            f'SELECT 약품코드, 현재_재고수량, 최종_업데이트일시 FROM {TABLE_NAME}',
+            conn,
+            dtype={'약품코드': str, '현재_재고수량': 'float64'}
+        )
+        conn.close()
+        return df
+
+    except Exception as e:
+        print(f"❌ 재고 DataFrame 조회 실패: {e}")
+        return pd.DataFrame()
+
+
 def upsert_inventory(df, show_summary=True):
     """
     재고 INSERT 또는 UPDATE (UPSERT)
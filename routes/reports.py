@@ -467,6 +467,18 @@ def list_reports(report_type):
         return jsonify({'error': str(e)}), 500
 
 
+def send_html_report(file_path):
+    """HTML 보고서 전송 (gzip 압축본이 있고 브라우저가 지원하면 압축본 전송)"""
+    gz_path = file_path + '.gz'
+    if 'gzip' in request.accept_encodings and os.path.exists(gz_path) \
+            and os.path.getmtime(gz_path) >= os.path.getmtime(file_path):
+        response = send_file(gz_path, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+    return send_file(file_path, mimetype='text/html')
+
+
 @reports_bp.route('/reports/<path:filename>')
 def serve_report(filename):
     """보고서 파일 제공"""
@@ -474,7 +486,7 @@ def serve_report(filename):
     if filename.startswith('inventory_report_') or filename.startswith('simple_report_'):
         file_path = os.path.join(paths.BASE_PATH, 'inventory_reports', filename)
         if os.path.exists(file_path):
-            return send_file(file_path, mimetype='text/html')
+            return send_html_report(file_path)
 
     # 고변동성 보고서 (volatility_reports 디렉토리)
     elif filename.startswith('volatility_report_'):
@@ -547,6 +559,10 @@ def delete_report():
             os.remove(file_path)
             print(f"✅ 보고서 삭제 완료: {filename}")
 
+            # gzip 압축본도 함께 삭제 (전문약/일반약 보고서의 경우)
+            if os.path.exists(file_path + '.gz'):
+                os.remove(file_path + '.gz')
+
             # CSV 파일도 함께 삭제 (주문 보고서의 경우)
             if report_type == 'order':
                 csv_filename = filename.replace('.html', '.csv')
@@ -0,0 +1,19 @@
+"""
+테스트 공통 설정
+
+DB 모듈들은 import 시점에 SQLite 파일을 만들므로,
+보고서 모듈을 import하기 전에 DB 경로를 임시 폴더로 돌려 저장소에 파일이 생기지 않게 한다.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import paths  # noqa: E402
+
+_TEST_DATA_DIR = tempfile.mkdtemp(prefix='jaego-test-')
+paths.get_base_path = lambda: _TEST_DATA_DIR
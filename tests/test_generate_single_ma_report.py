@@ -0,0 +1,125 @@
+"""generate_single_ma_report 헬퍼 함수 테스트"""
+
+import pandas as pd
+
+import generate_single_ma_report as report
+
+
+def test_winter_shapes_for_year_month_labels():
+    months = ['2024-09', '2024-10', '2024-11', '2024-12', '2025-01', '2025-02', '2025-03']
+
+    shapes = report.get_winter_shapes(months)
+
+    assert [(s['x0'], s['x1']) for s in shapes] == [('2024-10', '2025-02')]
+
+
+def test_winter_shapes_ignore_fallback_labels():
+    # 메타데이터가 없을 때 routes/reports.py가 만드는 레이블
+    months = [f"Month {i + 1}" for i in range(12)]
+
+    assert report.get_winter_shapes(months) == []
+
+
+def _sample_df(timeseries_list):
+    return pd.DataFrame([
+        {
+            '약품코드': str(600000000 + i),
+            '약품명': f'약품{i}',
+            '제약회사': '제약사',
+            '최종_재고수량': stock,
+            '월별_조제수량_리스트': ts,
+        }
+        for i, (ts, stock) in enumerate(timeseries_list)
+    ])
+
+
+def test_report_renders_with_fallback_month_labels():
+    df = _sample_df([([0, 3, 5, 2], 10), ([1, 1, 0, 4], 0), ([0, 0, 0, 0], 7)])
+    months = [f"Month {i + 1}" for i in range(4)]
+
+    html = report.generate_html_report(df, months, ma_months=3)
+
+    assert '600000001' in html
+
+
+def test_stack_timeseries_pads_ragged_rows_with_nan():
+    ts_matrix = report.stack_timeseries(pd.Series([[1, 2, 3], [4, 5]]))
+
+    assert ts_matrix.shape == (2, 3)
+    assert ts_matrix[1, 2] != ts_matrix[1, 2]  # NaN
+    assert report.unstack_timeseries(ts_matrix) == [[1.0, 2.0, 3.0], [4.0, 5.0]]
+
+
+def test_batched_helpers_match_per_row_results_for_ragged_rows():
+    rows = [[0, 3, 5, 2], [1, 4], [0, 0, 2]]
+    ts_matrix = report.stack_timeseries(pd.Series(rows))
+
+    assert report.calculate_custom_ma_rows(ts_matrix, 3) == [report.calculate_custom_ma(row, 3) for row in rows]
+
+    latest_ma, usage_months, is_corrected = report.get_corrected_ma_array(ts_matrix, 3)
+    expected = [report.get_corrected_ma(row, 3) for row in rows]
+    assert latest_ma.tolist() == [ma for ma, _, _ in expected]
+    assert usage_months.tolist() == [usage for _, usage, _ in expected]
+    assert is_corrected.tolist() == [corrected for _, _, corrected in expected]
+
+    ma_lists = report.calculate_custom_ma_rows(ts_matrix, 3)
+    assert report.create_sparkline_svgs(ts_matrix, ma_lists, 3) == [
+        report.create_sparkline_svg(row, ma, 3) for row, ma in zip(rows, ma_lists)
+    ]
+
+
+def test_report_renders_with_ragged_timeseries():
+    df = _sample_df([([0, 3, 5, 2], 10), ([1, 4], 0), ([0, 0, 0, 0], 7), ([2, 0, 1], -2)])
+    months = ['2024-11', '2024-12', '2025-01', '2025-02']
+
+    html = report.generate_html_report(df, months, ma_months=3)
+
+    assert '600000001' in html
+
+
+def test_sections_compute_ma_list_when_called_directly():
+    df = _sample_df([([0, 3, 5, 2], -4), ([1, 4, 2, 2], -1)]).assign(N개월_이동평균=[3.33, 2.67])
+
+    html = report.generate_negative_stock_section(df, 3, ['2024-11', '2024-12', '2025-01', '2025-02'],
+                                                  checked_codes=set(), memos={})
+
+    assert '<polyline' in html
+
+
+def test_dumps_json_writes_non_finite_floats_as_null(monkeypatch):
+    payload = {'ma': [1.5, float('nan'), None], 'latest_ma': float('inf'), 'name': '약품'}
+    expected = '{"ma":[1.5,null,null],"latest_ma":null,"name":"약품"}'
+
+    if report.orjson is not None:
+        assert report.dumps_json(payload) == expected
+
+    monkeypatch.setattr(report, 'orjson', None)
+    assert report.dumps_json(payload) == expected
+
+
+def test_section_chart_data_handles_missing_drug_name(monkeypatch):
+    # 약품명이 비어 있는 행은 DataFrame에서 float NaN으로 들어옴
+    df = _sample_df([([0, 3, 5, 2], -4), ([1, 4, 2, 2], -1)]).assign(
+        약품명=[float('nan'), '약품1'], N개월_이동평균=[3.33, 2.67],
+    )
+    months = ['2024-11', '2024-12', '2025-01', '2025-02']
+    monkeypatch.setattr(report, 'orjson', None)
+
+    html = report.generate_negative_stock_section(df, 3, months, checked_codes=set(), memos={})
+
+    assert '{&quot;drug_name&quot;:&quot;정보없음&quot;,&quot;drug_code&quot;:&quot;600000000&quot;' in html
+
+
+def test_report_escapes_drug_and_company_names_in_every_section():
+    # 메인/긴급/부족/과다/악성/음수 재고 행이 모두 나오도록 구성
+    df = _sample_df([
+        ([0, 3, 5, 2], 10), ([1, 4, 2, 2], 0), ([2, 2, 2, 2], 200),
+        ([0, 0, 0, 0], 7), ([2, 0, 1, 1], -2), ([3, 3, 3, 3], 20),
+    ]).assign(약품명='약품12<b>&"x', 제약회사='<i>제약')
+    months = ['2024-11', '2024-12', '2025-01', '2025-02']
+
+    html = report.generate_html_report(df, months, ma_months=3)
+
+    assert '약품12<b>' not in html
+    assert '<i>제약' not in html
+    assert '약품12&lt;b&gt;&amp;&quot;x' in html